@@ -2,10 +2,13 @@ from __future__ import annotations
 from pathlib import Path
 from typing import AsyncGenerator
 from agent.event import AgentEvent, AgentEventType
+from agent.tool_scheduler import DEFAULT_MAX_PARALLEL_TOOLS, ToolScheduler, tool_call_arguments
 from client.llm_client import LLMClient
 from client.response import StreamEventType, ToolCall, ToolResultMessage
 from context.manager import ContextManager
+from tools.base import ToolResult
 from tools.registry import create_default_registry
+from utils.text import StreamingTokenCounter
 
 class Agent:
     """
@@ -18,11 +21,19 @@ class Agent:
     - Manages context (future: compression, pruning)
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_response_tokens: int | None = None,
+        max_parallel_tools: int = DEFAULT_MAX_PARALLEL_TOOLS,
+    ):
         # Initialize the LLM client for API communication
         self.client = LLMClient()
         self.context_manager = ContextManager()
         self.tool_registry = create_default_registry()
+        # Stop a runaway generation once the streamed response exceeds this
+        self.max_response_tokens = max_response_tokens
+        # Read-only tool calls of one message run concurrently, up to this many
+        self.max_parallel_tools = max_parallel_tools
         
     async def run(self, message: str) -> AsyncGenerator[AgentEvent, None]:
         """
@@ -79,85 +90,173 @@ class Agent:
         
         # Accumulate the response text
         response_text = ""
+        # Live completion token count, fed delta by delta
+        response_tokens = StreamingTokenCounter(self.context_manager.model)
         
-        tool_schemas = self.tool_registry.get_schemas()
+        # Prebuilt once per registry version, not per turn
+        tool_schemas = self.tool_registry.get_tools_payload()
+        self.context_manager.tool_schema_tokens = self.tool_registry.get_schema_token_count(
+            self.context_manager.model
+        )
         tool_calls:list[ToolCall]=[]
         
+        # Stream completion from the LLM client
+        stream = self.client.chat_completion(
+            self.context_manager.get_messages(),
+            tools=tool_schemas if tool_schemas else None,
+            stream=True  # Enable streaming for real-time output
+        )
+
+        scheduler = ToolScheduler(
+            self.tool_registry,
+            Path.cwd(),
+            read_cache=self.context_manager.read_cache,
+            max_parallel=self.max_parallel_tools,
+        )
+        # tool_calls[:started] have been handed to the scheduler
+        started = 0
+        # Started calls have either reached the context or been abandoned
+        settled = False
         try:
-            # Stream completion from the LLM client
-            async for event in self.client.chat_completion(
-                self.context_manager.get_messages(),
-                tools=tool_schemas if tool_schemas else None,
-                stream=True  # Enable streaming for real-time output
-            ):
-                # Handle text delta events (streaming chunks)
-                if event.type == StreamEventType.TEXT_DELTA:
-                    if event.text_delta:
-                        content = event.text_delta.content
-                        response_text += content
-                        # Emit agent event for UI to display
-                        yield AgentEvent.text_delta(content)
-                
-                elif event.type == StreamEventType.TOOL_CALL_COMPLETE:
-                    if event.tool_call:
-                        tool_calls.append(event.tool_call)
-                    
-                
-                # Handle error events from LLM client
-                elif event.type == StreamEventType.ERROR:
-                    error_msg = event.error or "Unknown error occurred."
-                    yield AgentEvent.agent_error(error_msg)
-                    return  # Stop processing on error
-                
-                # Handle completion event
-                elif event.type == StreamEventType.MESSAGE_COMPLETE:
-                    self.context_manager.add_assistant_message(response_text or None,)
-                    # Stream is complete - emit final event
-                    if response_text:
-                        yield AgentEvent.text_complete(response_text)
-                        
-                tool_call_results:list[ToolResultMessage] = []
-                for tool_call in tool_calls:
-                    yield AgentEvent.tool_call_start(
-                        tool_call.call_id,
-                        tool_call.name,
-                        tool_call.arguments,
-                    )
-                    
-                    
-                    result = await self.tool_registry.invoke(
-                        tool_call.name ,
-                        tool_call.arguments,
-                        Path.cwd(),
-                    )
-                    yield AgentEvent.tool_call_complete(
-                        tool_call.call_id,
-                        tool_call.name,
-                        result,
-                    )
-                    tool_call_results.append(
-                        ToolResultMessage(
-                            tool_call_id=tool_call.call_id,
-                            content= result.to_model_output(),
-                            is_error = not result.success,
+            try:
+                async for event in stream:
+                    # Handle text delta events (streaming chunks)
+                    if event.type == StreamEventType.TEXT_DELTA:
+                        if event.text_delta:
+                            content = event.text_delta.content
+                            response_text += content
+                            completion_tokens = response_tokens.feed(content)
+                            # Emit agent event for UI to display
+                            yield AgentEvent.text_delta(content, completion_tokens)
+
+                            if (
+                                self.max_response_tokens is not None
+                                and completion_tokens > self.max_response_tokens
+                            ):
+                                # Budget exceeded - stop the stream and keep what we have
+                                await stream.aclose()
+                                self.context_manager.add_assistant_message(
+                                    response_text,
+                                    token_count=response_tokens.total,
+                                )
+                                yield AgentEvent.text_complete(response_text)
+                                settled = True
+                                async for abandoned in self._abandon_tool_calls(
+                                    scheduler, tool_calls[:started], "response token budget exceeded"
+                                ):
+                                    yield abandoned
+                                return
+
+                    elif event.type == StreamEventType.TOOL_CALL_COMPLETE:
+                        if event.tool_call:
+                            tool_calls.append(event.tool_call)
+                            # Read-only calls start right away, overlapping the rest
+                            # of the generation; a mutating call (and anything after
+                            # it) waits until the whole message has arrived
+                            while started < len(tool_calls) and not scheduler.is_mutating(tool_calls[started]):
+                                yield self._start_tool_call(scheduler, tool_calls[started])
+                                started += 1
+
+                    # Handle error events from LLM client
+                    elif event.type == StreamEventType.ERROR:
+                        error_msg = event.error or "Unknown error occurred."
+                        yield AgentEvent.agent_error(error_msg)
+                        settled = True
+                        async for abandoned in self._abandon_tool_calls(
+                            scheduler, tool_calls[:started], "the response failed"
+                        ):
+                            yield abandoned
+                        return  # Stop processing on error
+
+                    # Handle completion event
+                    elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                        if event.usage:
+                            self.context_manager.record_usage(
+                                event.usage,
+                                extra_texts=[self.tool_registry.get_tools_payload_json()] if tool_schemas else None,
+                            )
+                        self.context_manager.add_assistant_message(
+                            response_text or None,
+                            token_count=response_tokens.total,
                         )
+                        # Stream is complete - emit final event
+                        if response_text:
+                            yield AgentEvent.text_complete(response_text)
+
+            except Exception as e:
+                # Catch any unexpected errors in the loop
+                yield AgentEvent.agent_error(
+                    error=str(e),
+                    details={"location": "_agentic_loop"}
+                )
+                settled = True
+                async for abandoned in self._abandon_tool_calls(
+                    scheduler, tool_calls[:started], "the response failed"
+                ):
+                    yield abandoned
+                return
+
+            for tool_call in tool_calls[started:]:
+                yield self._start_tool_call(scheduler, tool_call)
+
+            # Results are collected (and added to the context) in the order
+            # the model issued the calls, whatever order they finish in
+            tool_call_results:list[ToolResultMessage] = []
+            for index, tool_call in enumerate(tool_calls):
+                result = await scheduler.result(index)
+                yield AgentEvent.tool_call_complete(
+                    tool_call.call_id,
+                    tool_call.name,
+                    result,
+                )
+                tool_call_results.append(
+                    ToolResultMessage(
+                        tool_call_id=tool_call.call_id,
+                        content= result.to_model_output(),
+                        is_error = not result.success,
                     )
-                    
-                for tool_result in tool_call_results:
-                    self.context_manager.add_tool_result(
-                        tool_result.tool_call_id,
-                        tool_result.content
-                        )
-                
-                
-        except Exception as e:
-            # Catch any unexpected errors in the loop
-            yield AgentEvent.agent_error(
-                error=str(e),
-                details={"location": "_agentic_loop"}
+                )
+
+            for tool_result in tool_call_results:
+                self.context_manager.add_tool_result(
+                    tool_result.tool_call_id,
+                    tool_result.content
+                    )
+            settled = True
+        finally:
+            if len(scheduler) and not settled:
+                # The consumer stopped iterating: there is no one left to
+                # report to, just stop the calls and forget what they read
+                await scheduler.cancel()
+                self.context_manager.read_cache.invalidate()
+
+    async def _abandon_tool_calls(
+        self,
+        scheduler: ToolScheduler,
+        tool_calls: list[ToolCall],
+        reason: str,
+    ) -> AsyncGenerator[AgentEvent, None]:
+        # The turn was cut short: stop speculative calls and forget what they
+        # read, since their results never reach the context. Each started
+        # call still gets its tool_call_complete so the UI can close it.
+        if len(scheduler):
+            await scheduler.cancel()
+            self.context_manager.read_cache.invalidate()
+        for tool_call in tool_calls:
+            yield AgentEvent.tool_call_complete(
+                tool_call.call_id,
+                tool_call.name,
+                ToolResult.error_result(f"Cancelled: {reason}"),
             )
-            return
-    
+
+    def _start_tool_call(self, scheduler: ToolScheduler, tool_call: ToolCall) -> AgentEvent:
+        scheduler.schedule(tool_call)
+        return AgentEvent.tool_call_start(
+            tool_call.call_id,
+            tool_call.name,
+            tool_call_arguments(tool_call),
+        )
+
     # ---------------------------------------------------------------
     # Async context manager methods for proper resource cleanup
     # ---------------------------------------------------------------
@@ -64,11 +64,12 @@ class AgentEvent:
         )
         
     @classmethod
-    def text_delta(cls,content:str)-> AgentEvent:
+    def text_delta(cls,content:str,completion_tokens:int|None=None)-> AgentEvent:
         return cls(
             type=AgentEventType.TEXT_DELTA,
             data={
-                "content":content
+                "content":content,
+                "completion_tokens":completion_tokens,
             }
         )
     @classmethod
@@ -0,0 +1,113 @@
+from __future__ import annotations
+import asyncio
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from client.response import ToolCall, parse_tool_call_arguments
+from tools.base import ToolResult
+from tools.registry import ToolRegistry
+
+if TYPE_CHECKING:
+    from context.read_cache import ReadCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PARALLEL_TOOLS = 4
+
+
+def tool_call_arguments(tool_call: ToolCall) -> dict[str, Any]:
+    arguments = tool_call.arguments
+    if isinstance(arguments, str):
+        return parse_tool_call_arguments(arguments)
+    return arguments or {}
+
+
+class ToolScheduler:
+    """
+    Runs the tool calls of one assistant message.
+
+    Read-only calls run concurrently, at most `max_parallel` at a time, so a
+    fan-out of reads takes as long as the slowest one. A mutating call
+    (Tool.is_mutating) waits for every call scheduled before it and holds
+    back every call scheduled after it, so each call sees the same state as
+    with sequential execution. Results are handed back in call order.
+    """
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        cwd: Path,
+        read_cache: ReadCache | None = None,
+        max_parallel: int = DEFAULT_MAX_PARALLEL_TOOLS,
+    ) -> None:
+        self._registry = registry
+        self._cwd = cwd
+        self._read_cache = read_cache
+        self._semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self._tasks: list[asyncio.Task[ToolResult]] = []
+        # Latest mutating call; later calls must not start before it ends
+        self._barrier: asyncio.Task[ToolResult] | None = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def is_mutating(self, tool_call: ToolCall) -> bool:
+        tool = self._registry.get(tool_call.name)
+        return tool is not None and tool.is_mutating(tool_call_arguments(tool_call))
+
+    def schedule(self, tool_call: ToolCall) -> asyncio.Task[ToolResult]:
+        arguments = tool_call_arguments(tool_call)
+        mutating = self.is_mutating(tool_call)
+        if mutating:
+            wait_for = list(self._tasks)
+        else:
+            wait_for = [self._barrier] if self._barrier is not None else []
+
+        # Pinned now: if the read cache is cleared before this call ends
+        # (e.g. the turn is cancelled), its late writes are dropped
+        epoch = self._read_cache.epoch if self._read_cache is not None else None
+        task = asyncio.create_task(
+            self._run(tool_call, arguments, wait_for, epoch),
+            name=f"tool:{tool_call.name}:{tool_call.call_id}",
+        )
+        self._tasks.append(task)
+        if mutating:
+            self._barrier = task
+        return task
+
+    async def _run(
+        self,
+        tool_call: ToolCall,
+        arguments: dict[str, Any],
+        wait_for: list[asyncio.Task[ToolResult]],
+        epoch: int | None,
+    ) -> ToolResult:
+        if wait_for:
+            await asyncio.wait(wait_for)
+        async with self._semaphore:
+            return await self._registry.invoke(
+                tool_call.name,
+                arguments,
+                self._cwd,
+                call_id=tool_call.call_id,
+                read_cache=self._read_cache,
+                read_cache_epoch=epoch,
+            )
+
+    async def result(self, index: int) -> ToolResult:
+        """Result of the index-th scheduled call, once it has finished."""
+        try:
+            return await self._tasks[index]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("tool call failed outside the tool")
+            return ToolResult.error_result(f"Internal error:{str(e)}")
+
+    async def cancel(self) -> None:
+        """Cancel every call that has not finished yet."""
+        pending = [task for task in self._tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
@@ -0,0 +1,77 @@
+"""
+Event-loop lag while Read_file serves large reads: blocking on the loop
+versus the utils.async_io executor.
+
+A ticker coroutine stands in for the LLM stream / TUI redraw; its worst
+delay is how long the loop was frozen.
+
+Usage:
+    python -m benchmarks.bench_event_loop_lag [size_mb] [reads]    (default: 50 8)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tools.base import ToolInvocation
+from tools.builtin.read_file import ReadFileTool
+from utils.line_index import get_line_index_cache
+
+from benchmarks.bench_read_file import make_file
+
+TICK = 0.005
+
+
+async def ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(label: str, read, invocation: ToolInvocation, reads: int) -> None:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(read(invocation) for _ in range(reads)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    print(
+        f"  {label:<22} total {elapsed * 1000:8.1f} ms   ticks {len(lags):5}   "
+        f"max lag {max(lags, default=0.0) * 1000:8.1f} ms   p99 {p99 * 1000:7.1f} ms"
+    )
+
+
+async def main(size_mb: int, reads: int) -> None:
+    tool = ReadFileTool()
+
+    async def on_loop(invocation: ToolInvocation):
+        # What execute() did before: all blocking work inline
+        return tool._probe_and_read(invocation, tool.schema(**invocation.params))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"bench_{size_mb}mb.log")
+        total = make_file(path, size_mb)
+        print(f"{size_mb} MB, {total} lines, {reads} concurrent reads of the middle 2000 lines")
+        invocation = ToolInvocation(
+            cwd=Path(tmp),
+            params={"path": path, "offset": total // 2, "limit": 2000},
+        )
+        # Cold line index for both, so each pays for the first scan
+        await run("on event loop", on_loop, invocation, reads)
+        get_line_index_cache().invalidate(path)
+        await run("run_blocking", tool.execute, invocation, reads)
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [50, 8][len(args):])))
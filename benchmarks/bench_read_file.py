@@ -0,0 +1,60 @@
+"""
+Range reads: legacy read_text/splitlines/slice versus utils.file_reader.
+
+Usage:
+    python -m benchmarks.bench_read_file [size_mb ...]    (default: 100 1024)
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utils.file_reader import read_line_range
+from utils.line_index import get_line_index_cache
+
+LINE = "2025-01-01T00:00:00Z INFO worker-{:07d} handled request in 12ms status=200\n"
+
+
+def make_file(path: str, size_mb: int) -> int:
+    target = size_mb * 1024 * 1024
+    lines = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while f.tell() < target:
+            f.write("".join(LINE.format(lines + i) for i in range(10000)))
+            lines += 10000
+    return lines
+
+
+def legacy_read(path: str, offset: int, limit: int) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    return lines[offset - 1:offset - 1 + limit]
+
+
+def measure(label: str, func, *args) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<34} {elapsed * 1000:9.1f} ms   peak {peak / (1024 * 1024):8.1f} MB")
+
+
+def main(sizes: list[int]) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            path = os.path.join(tmp, f"bench_{size_mb}mb.log")
+            total = make_file(path, size_mb)
+            print(f"{size_mb} MB, {total} lines")
+            for offset in (1, total // 2, total - 100):
+                measure(f"legacy  lines {offset}+100", legacy_read, path, offset, 100)
+                get_line_index_cache().invalidate(path)
+                measure(f"mmap    lines {offset}+100 cold", read_line_range, path, offset, 100)
+                measure(f"mmap    lines {offset}+100 warm", read_line_range, path, offset, 100)
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1024])
@@ -0,0 +1,45 @@
+"""
+Per-call cost of count_tokens before and after the tokenizer registry.
+
+Usage:
+    python -m benchmarks.bench_tokenizer [model]
+"""
+import sys
+import timeit
+
+import tiktoken
+
+from utils.text import count_tokens
+
+SAMPLES = {
+    "short": "Read the file and tell me what it does.",
+    "medium": "def handler(event, context):\n    return {'ok': True}\n" * 40,
+}
+
+
+def legacy_count_tokens(text: str, model: str) -> int:
+    # The pre-registry implementation: resolve the model on every call
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except Exception:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return len(encoding.encode(text))
+
+
+def main(model: str = "qwen/qwen3-coder:free", number: int = 20000) -> None:
+    count_tokens("warm up", model)
+    legacy_count_tokens("warm up", model)
+
+    print(f"model={model} calls={number}")
+    for label, text in SAMPLES.items():
+        before = timeit.timeit(lambda: legacy_count_tokens(text, model), number=number)
+        after = timeit.timeit(lambda: count_tokens(text, model), number=number)
+        print(
+            f"{label:>8}: before {before / number * 1e6:8.2f} us/call  "
+            f"after {after / number * 1e6:8.2f} us/call  "
+            f"({before / after:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
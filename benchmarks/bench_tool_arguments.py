@@ -0,0 +1,75 @@
+"""
+Cost of assembling streamed tool-call arguments: string += with a
+json.loads at the end (and with a completeness probe on every delta that
+ends in "}") versus ToolArgumentsParser.
+
+Usage:
+    python -m benchmarks.bench_tool_arguments [content_mb] [delta_chars]
+"""
+import json
+import re
+import sys
+import time
+
+from client.response import ToolArgumentsParser, parse_tool_call_arguments
+
+LINE = '    return {"ok": True, "items": [x for x in range(10)]}  # \\done\n'
+
+
+def make_deltas(content_mb: float, delta_chars: int) -> list[str]:
+    content = LINE * int(content_mb * 1024 * 1024 / len(LINE))
+    text = json.dumps({"path": "src/generated.py", "content": content})
+    deltas = []
+    for i in range(0, len(text), delta_chars):
+        # Tokenizers emit "}" as a token of its own, so deltas often end on one
+        deltas.extend(d for d in re.split(r"(?<=})", text[i:i + delta_chars]) if d)
+    return deltas
+
+
+def concat_then_parse(deltas: list[str]) -> dict:
+    arguments = ""
+    for delta in deltas:
+        arguments += delta
+    return parse_tool_call_arguments(arguments)
+
+
+def concat_and_probe(deltas: list[str]) -> dict:
+    # Detecting completeness without a tokenizer: try to parse whenever a
+    # delta could have closed the object
+    arguments = ""
+    for delta in deltas:
+        arguments += delta
+        if delta.rstrip().endswith("}"):
+            try:
+                return json.loads(arguments)
+            except json.JSONDecodeError:
+                pass
+    return parse_tool_call_arguments(arguments)
+
+
+def incremental(deltas: list[str]) -> dict:
+    parser = ToolArgumentsParser()
+    for delta in deltas:
+        parser.feed(delta)
+    return parser.result()
+
+
+def main(content_mb: float = 0.25, delta_chars: int = 64) -> None:
+    deltas = make_deltas(float(content_mb), int(delta_chars))
+    size = sum(len(d) for d in deltas)
+    print(f"arguments={size / (1024 * 1024):.1f}MB deltas={len(deltas)}")
+    expected = json.loads("".join(deltas))
+    for label, func in (
+        ("+= then json.loads", concat_then_parse),
+        ("+= and probe on '}'", concat_and_probe),
+        ("ToolArgumentsParser", incremental),
+    ):
+        start = time.perf_counter()
+        result = func(deltas)
+        elapsed = time.perf_counter() - start
+        assert result == expected, label
+        print(f"  {label:<22} {elapsed * 1000:9.1f} ms  ({elapsed / len(deltas) * 1e6:.2f} us/delta)")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,92 @@
+"""
+Per-call overhead of ToolRegistry.invoke: validating parameters by
+constructing the schema model and constructing it again in execute,
+versus one validation with the cached compiled validator whose result
+travels on the ToolInvocation.
+
+Usage:
+    python -m benchmarks.bench_tool_invoke [calls]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from tools.base import Tool, ToolInvocation, ToolKind, ToolResult
+from tools.builtin.read_file import ReadFileParams
+from tools.registry import ToolRegistry
+
+PARAMS = {"path": "src/app.py", "offset": 120, "limit": 80, "format": "compact"}
+INVALID_PARAMS = {"path": "src/app.py", "offset": 0}
+
+
+class NoopReadTool(Tool):
+    """Read_file's schema with no I/O, so only the invoke overhead is left."""
+
+    name = "Noop_read"
+    kind = ToolKind.READ
+    schema = ReadFileParams
+
+    async def execute(self, invocation: ToolInvocation) -> ToolResult:
+        params = self.typed_params(invocation)
+        return ToolResult.success_result(params.path)
+
+
+class LegacyNoopReadTool(NoopReadTool):
+    name = "Legacy_noop_read"
+
+    async def execute(self, invocation: ToolInvocation) -> ToolResult:
+        params = ReadFileParams(**invocation.params)
+        return ToolResult.success_result(params.path)
+
+
+async def legacy_invoke(tool: Tool, parameters: dict, cwd: Path) -> ToolResult:
+    # The pre-validator registry path: validate_params built a model and
+    # discarded it, then execute built it again
+    schema = tool.schema
+    try:
+        schema(**parameters)
+    except ValidationError as e:
+        errors = [
+            f"Parameter '{'.'.join(str(x) for x in error.get('loc', []))}': {error.get('msg')} "
+            for error in e.errors()
+        ]
+        return ToolResult.error_result(f"Invalid parameters: {'; '.join(errors)}")
+    return await tool.execute(ToolInvocation(cwd=cwd, params=parameters))
+
+
+async def run(calls: int) -> None:
+    registry = ToolRegistry()
+    tool = NoopReadTool()
+    registry.register(tool)
+    legacy_tool = LegacyNoopReadTool()
+    cwd = Path.cwd()
+
+    async def measure(label: str, invoke, parameters: dict) -> float:
+        await invoke(parameters)
+        start = time.perf_counter()
+        for _ in range(calls):
+            await invoke(parameters)
+        per_call = (time.perf_counter() - start) / calls
+        print(f"  {label:<28} {per_call * 1e6:8.2f} us/call")
+        return per_call
+
+    print(f"calls={calls}")
+    for kind, parameters in (("valid", PARAMS), ("invalid", INVALID_PARAMS)):
+        before = await measure(
+            f"{kind}: before", lambda p: legacy_invoke(legacy_tool, p, cwd), parameters
+        )
+        after = await measure(
+            f"{kind}: registry.invoke", lambda p: registry.invoke(tool.name, p, cwd), parameters
+        )
+        print(f"  {kind}: {before / after:.1f}x")
+
+
+def main(calls: int = 20000) -> None:
+    asyncio.run(run(int(calls)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,85 @@
+"""
+Tokens per file for Read_file's output formats: numbered (every line),
+compact with sparse anchors only, and compact with folded indentation.
+
+Usage:
+    python -m benchmarks.measure_read_format [--model MODEL] [--top N] [root ...]
+        (default: the current directory)
+"""
+import argparse
+import os
+from pathlib import Path
+
+from utils.file_reader import decode_text, split_lines
+from utils.line_format import format_compact, format_numbered
+from utils.paths import probe_file
+from utils.text import count_tokens_batch
+
+SKIP_DIRS = {".git", ".hg", ".venv", "venv", "node_modules", "__pycache__", "build", "dist"}
+MAX_FILE_SIZE = 1024 * 1024
+
+
+def iter_text_files(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            try:
+                with probe_file(path) as probe:
+                    if not probe.is_file or probe.is_binary or not 0 < probe.size <= MAX_FILE_SIZE:
+                        continue
+                    with probe.open_content() as f:
+                        text = decode_text(f.read(), probe.encoding)
+            except OSError:
+                continue
+            yield path, split_lines(text)
+
+
+def measure(root: Path, model: str, top: int) -> None:
+    files = []
+    texts = []
+    for path, lines in iter_text_files(root):
+        files.append(path)
+        texts.append("\n".join(format_numbered(lines)))
+        texts.append("\n".join(format_compact(lines, fold=False)))
+        texts.append("\n".join(format_compact(lines, fold=True)))
+
+    if not files:
+        print(f"{root}: no text files")
+        return
+
+    counts = count_tokens_batch(texts, model)
+    rows = [
+        (path, counts[3 * i], counts[3 * i + 1], counts[3 * i + 2])
+        for i, path in enumerate(files)
+    ]
+    numbered = sum(row[1] for row in rows)
+    anchors = sum(row[2] for row in rows)
+    compact = sum(row[3] for row in rows)
+
+    def pct(value: int, base: int) -> str:
+        return f"{(value - base) / base * 100:+6.1f}%" if base else "   n/a"
+
+    print(f"{root}: {len(rows)} files")
+    print(f"  {'numbered':<22} {numbered:10}")
+    print(f"  {'compact, anchors only':<22} {anchors:10}  {pct(anchors, numbered)}")
+    print(f"  {'compact, folded':<22} {compact:10}  {pct(compact, numbered)}")
+
+    rows.sort(key=lambda row: row[1] - row[3], reverse=True)
+    print(f"  largest savings (numbered -> anchors only -> folded):")
+    for path, n, a, c in rows[:top]:
+        print(f"    {n:8} {a:8} {c:8}  {pct(c, n)}  {path.relative_to(root)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("roots", nargs="*", default=["."])
+    parser.add_argument("--model", default="qwen/qwen3-coder:free")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    for root in args.roots:
+        measure(Path(root).resolve(), args.model, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ from client.response import (
     TokenUsage,
     ToolCall,
     ToolCallDelta,
+    ToolArgumentsParser,
     parse_tool_call_arguments,
     )
 
@@ -112,8 +113,12 @@ class LLMClient:
             logger.info("AsyncOpenAI client closed")
             
     def _build_tools(self, tools:list[dict[str,Any]])->list[dict[str,Any]]:
+        # Entries already in request form (ToolRegistry.get_tools_payload)
+        # are passed through as they are
         return [
-            {
+            tool
+            if tool.get("type") == "function" and "function" in tool
+            else {
                 "type":"function",
                 "function":{
                     "name":tool["name"],
@@ -158,6 +163,8 @@ class LLMClient:
         Implementation details:
             - Retries with exponential backoff: 1s, 2s, 4s for rate limits
             - Immediate retry on connection errors (up to max_retries)
+            - No retry once a TOOL_CALL_COMPLETE was yielded, since the
+              consumer may already be running that call
             - Yields error events for unrecoverable failures
         """
         client = self.get_client()
@@ -172,16 +179,25 @@ class LLMClient:
             **kwargs  # Allow caller to override defaults
         }
         
+        if stream:
+            # Usage arrives in a final chunk only when asked for
+            api_kwargs.setdefault("stream_options", {"include_usage": True})
+        
         if tools:
             api_kwargs["tools"]=self._build_tools(tools)
             kwargs["tool_choice"]= "auto"
         
         # Retry loop with exponential backoff
+        # Set once a finished tool call went downstream: the consumer may
+        # already be running it, so a replayed stream would run it twice
+        tool_call_sent = False
         for attempt in range(self._max_retries + 1):
             try:
                 # Route to appropriate handler based on streaming mode
                 if stream:
                     async for event in self._stream_response(client, api_kwargs):
+                        if event.type == StreamEventType.TOOL_CALL_COMPLETE:
+                            tool_call_sent = True
                         yield event
                 else:
                     event = await self._non_stream_response(client, api_kwargs)
@@ -190,7 +206,13 @@ class LLMClient:
                 
             except RateLimitError as e:
                 # Rate limit hit - use exponential backoff before retry
-                if attempt < self._max_retries:
+                if tool_call_sent:
+                    yield StreamEvent(
+                        type=StreamEventType.ERROR,
+                        error=f"Rate limited after tool calls were already started, not retrying: {e}",
+                    )
+                    return
+                elif attempt < self._max_retries:
                     # Exponential backoff: 1s → 2s → 4s
                     wait_time = 2 ** attempt
                     logger.warning(
@@ -209,7 +231,14 @@ class LLMClient:
                     
             except APIConnectionError as e:
                 # Connection error - retry immediately (network might recover)
-                if attempt < self._max_retries:
+                if tool_call_sent:
+                    logger.error("Connection lost after tool calls were already started")
+                    yield StreamEvent(
+                        type=StreamEventType.ERROR,
+                        error=f"Connection lost after tool calls were already started, not retrying: {e}",
+                    )
+                    return
+                elif attempt < self._max_retries:
                     logger.warning(
                         f"Connection error (attempt {attempt + 1}/{self._max_retries + 1}). "
                         f"Retrying immediately..."
@@ -257,7 +286,9 @@ class LLMClient:
             kwargs: Parameters to pass to the chat.completions.create call.
             
         Yields:
-            StreamEvent: TEXT_DELTA events for each chunk, MESSAGE_COMPLETE at end.
+            StreamEvent: TEXT_DELTA events for each chunk, TOOL_CALL_* events
+                for tool calls (TOOL_CALL_COMPLETE as soon as a call's arguments
+                are complete, not at the end), MESSAGE_COMPLETE at end.
             
         ✔ TODO: Add support for function/tool calls in streaming mode DOnE
         TODO: Handle multiple choices if max_choices > 1
@@ -278,6 +309,7 @@ class LLMClient:
             if hasattr(chunk, "usage") and chunk.usage:
                 usage = TokenUsage(
                     prompt_tokens=chunk.usage.prompt_tokens,
+                    completion_tokens=chunk.usage.completion_tokens,
                     total_tokens=chunk.usage.total_tokens,
                     cached_tokens=chunk.usage.prompt_tokens_details.cached_tokens
                     if chunk.usage.prompt_tokens_details
@@ -311,48 +343,53 @@ class LLMClient:
                     idx = tool_call_delta.index
 
                     if idx not in tool_calls:
+                        # A new index means the model is done with every earlier call
+                        for event in self._finish_tool_calls(tool_calls, before=idx):
+                            yield event
                         tool_calls[idx]={
                             'id': tool_call_delta.id or "",
                             "name": "",
-                            "arguments": "",
+                            "arguments": ToolArgumentsParser(),
+                            "complete": False,
                         }
-                        if tool_call_delta.function:
-                            if tool_call_delta.function.name:
-                                tool_calls[idx]["name"] = tool_call_delta.function.name
-                                yield StreamEvent(
-                                    type=StreamEventType.TOOL_CALL_START,
-                                    tool_call_delta=ToolCallDelta(
-                                        call_id= tool_calls[idx]['id'],
-                                        name= tool_call_delta.function.name,
-                                        
-                                        ),
-                                    
-                                ) 
-                            
-                            if tool_call_delta.function.arguments:
-                                tool_calls[idx]["arguments"] += tool_call_delta.function.arguments
-                                yield StreamEvent(
-                                    type=StreamEventType.TOOL_CALL_DELTA,
-                                    tool_call_delta=ToolCallDelta(
-                                        call_id= tool_calls[idx]['id'],
-                                        name= tool_call_delta.function.name,
-                                        arguments_delta=tool_call_delta.function.arguments,
-                                        ),
-                                    
-                                ) 
-            
-            
-        for idx ,tc in tool_calls.items():
-            yield StreamEvent(
-                type=StreamEventType.TOOL_CALL_COMPLETE,
-                tool_call= ToolCall(
-                    call_id=tc['id'],
-                    name=tc['name'],
-                    arguments=parse_tool_call_arguments(tc['arguments']),
-                    
-                )
-            )  
-        
+                    tc = tool_calls[idx]
+                    if tool_call_delta.id and not tc['id']:
+                        tc['id'] = tool_call_delta.id
+                    function = tool_call_delta.function
+                    if not function or tc['complete']:
+                        continue
+
+                    if function.name and not tc['name']:
+                        tc["name"] = function.name
+                        yield StreamEvent(
+                            type=StreamEventType.TOOL_CALL_START,
+                            tool_call_delta=ToolCallDelta(
+                                call_id= tc['id'],
+                                name= function.name,
+                                ),
+                        )
+
+                    if function.arguments:
+                        parser = tc["arguments"]
+                        completed_fields = parser.feed(function.arguments)
+                        yield StreamEvent(
+                            type=StreamEventType.TOOL_CALL_DELTA,
+                            tool_call_delta=ToolCallDelta(
+                                call_id= tc['id'],
+                                name= tc['name'],
+                                arguments_delta=function.arguments,
+                                completed_fields=completed_fields,
+                                ),
+                        )
+                        # Finalize as soon as the arguments object closes, so
+                        # the agent can start the tool while the rest streams
+                        if parser.complete:
+                            tc['complete'] = True
+                            yield self._tool_call_complete(tc)
+
+        for event in self._finish_tool_calls(tool_calls):
+            yield event
+
         # Signal completion with final usage statistics
         yield StreamEvent(
             type=StreamEventType.MESSAGE_COMPLETE,
@@ -360,6 +397,32 @@ class LLMClient:
             usage=usage,
         )
 
+    @staticmethod
+    def _tool_call_complete(tc: dict[str, Any]) -> StreamEvent:
+        return StreamEvent(
+            type=StreamEventType.TOOL_CALL_COMPLETE,
+            tool_call= ToolCall(
+                call_id=tc['id'],
+                name=tc['name'],
+                arguments=tc['arguments'].result(),
+            )
+        )
+
+    def _finish_tool_calls(
+        self,
+        tool_calls: dict[int, dict[str, Any]],
+        before: int | None = None,
+    ) -> list[StreamEvent]:
+        """TOOL_CALL_COMPLETE for every call (below `before`) not yet finalized."""
+        events = []
+        for idx in sorted(tool_calls):
+            tc = tool_calls[idx]
+            if tc['complete'] or (before is not None and idx >= before):
+                continue
+            tc['complete'] = True
+            events.append(self._tool_call_complete(tc))
+        return events
+
     async def _non_stream_response(
         self,
         client: AsyncOpenAI,
@@ -412,6 +475,7 @@ class LLMClient:
         if response.usage:
             usage = TokenUsage(
                 prompt_tokens=response.usage.prompt_tokens,
+                completion_tokens=response.usage.completion_tokens,
                 total_tokens=response.usage.total_tokens,
                 cached_tokens=response.usage.prompt_tokens_details.cached_tokens
                 if response.usage.prompt_tokens_details
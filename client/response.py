@@ -7,9 +7,10 @@ from __future__ import annotations
 # Standard‑library imports
 # -------------------------------------------------
 from ast import arguments
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import json
+import re
 from typing import Any, Optional
 
 
@@ -59,6 +60,8 @@ class ToolCallDelta:
     call_id:str
     name:str|None
     arguments_delta:str=""
+    # Top-level arguments completed by this delta, decoded
+    completed_fields:dict[str,Any]=field(default_factory=dict)
     
 @dataclass
 class ToolResultMessage:
@@ -96,4 +99,147 @@ def parse_tool_call_arguments(arguments_str:str)->dict[str,Any]:
     try:
         return json.loads(arguments_str)
     except json.JSONDecodeError:
-        return {"raw_arguments": arguments_str}
\ No newline at end of file
+        return {"raw_arguments": arguments_str}
+
+# The rest of a string up to its closing quote (or a backslash ending the
+# chunk); outside strings only structure matters
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_STRUCTURAL = re.compile(r'["{}\[\],]')
+
+
+class ToolArgumentsParser:
+    """
+    Incremental tokenizer for the JSON object of a streamed tool call.
+
+    Argument deltas are kept as a list of chunks and each character is
+    scanned once, as it arrives, so finding out whether the arguments are
+    complete costs nothing per delta. Each top-level field is decoded the
+    moment it closes and is available in `fields` while the rest (e.g. a
+    multi-megabyte "content") is still streaming; `result()` assembles the
+    final dict from them without scanning the text again.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self.fields: dict[str, Any] = {}
+        self.complete = False
+        # Set when the text is not a well-formed object; result() then
+        # falls back to parse_tool_call_arguments on the whole text
+        self._invalid = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._members = 0
+        # (chunk index, offset) where the current top-level member begins
+        self._member_start: tuple[int, int] | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> dict[str, Any]:
+        """Consume one delta; returns the top-level fields it completed."""
+        if not chunk:
+            return {}
+        index = len(self._chunks)
+        self._chunks.append(chunk)
+        if self._invalid:
+            return {}
+        if self.complete:
+            if chunk.strip():
+                self._invalid = True
+            return {}
+
+        completed: dict[str, Any] = {}
+        pos = 0
+        if not self._started:
+            stripped = chunk.lstrip()
+            if not stripped:
+                return {}
+            if stripped[0] != "{":
+                self._invalid = True
+                return {}
+            self._started = True
+            self._depth = 1
+            pos = len(chunk) - len(stripped) + 1
+            self._member_start = (index, pos)
+
+        length = len(chunk)
+        while pos < length:
+            if self._escape:
+                # The escaped character may be the first one of this chunk
+                self._escape = False
+                pos += 1
+                continue
+
+            if self._in_string:
+                # Skip the string body, escapes included, in one match
+                pos = _STRING_BODY.match(chunk, pos).end()
+                if pos == length:
+                    break
+                if chunk[pos] == "\\":
+                    # A backslash ending the chunk escapes the next one's first character
+                    self._escape = True
+                else:
+                    self._in_string = False
+                pos += 1
+                continue
+
+            match = _STRUCTURAL.search(chunk, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif self._depth > 1:
+                if char != ",":
+                    self._depth -= 1
+            else:
+                # "," or the closing "}" of the arguments object
+                self._close_member(index, match.start(), char == "}", completed)
+                if char == ",":
+                    self._member_start = (index, pos)
+                else:
+                    self._depth = 0
+                    self.complete = True
+                    if chunk[pos:].strip():
+                        self._invalid = True
+                    break
+
+        return completed
+
+    def _close_member(self, index: int, end: int, closing: bool, completed: dict[str, Any]) -> None:
+        start_index, start = self._member_start
+        if start_index == index:
+            member = self._chunks[index][start:end]
+        else:
+            member = "".join(
+                [
+                    self._chunks[start_index][start:],
+                    *self._chunks[start_index + 1:index],
+                    self._chunks[index][:end],
+                ]
+            )
+        if not member.strip():
+            # Only "{}" may have an empty member; "{,", "{"a": 1,}" may not
+            if not closing or self._members:
+                self._invalid = True
+            return
+        try:
+            decoded = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            self._invalid = True
+            return
+        self._members += 1
+        completed.update(decoded)
+        self.fields.update(decoded)
+
+    def result(self) -> dict[str, Any]:
+        """The parsed arguments; falls back like parse_tool_call_arguments."""
+        if self.complete and not self._invalid:
+            return self.fields
+        return parse_tool_call_arguments(self.text)
@@ -1,7 +1,12 @@
 from prompts.system import get_system_prompt
 from dataclasses import dataclass, field
-from utils.text import count_tokens
+from utils.text import count_tokens, count_tokens_batch, get_estimator
 from typing import Any
+from client.response import TokenUsage
+from context.read_cache import ReadCache
+
+# Role/formatting tokens the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
 
 @dataclass
 class MessageItem:
@@ -29,6 +34,12 @@ class ContextManager:
     def __init__(self)->None:
         self._system_prompt=get_system_prompt()
         self._messages:list[MessageItem] =[]
+        # How many messages went into the last request, for usage reconciliation
+        self._sent_message_count = 0
+        # Reads already returned into this context, for "unchanged" stubs
+        self.read_cache = ReadCache()
+        # Fixed per-request cost of the tool definitions (ToolRegistry.get_schema_token_count)
+        self.tool_schema_tokens = 0
         self.model="qwen/qwen3-coder:free" # if future we will make it clean/secure using .env and config 
         
     def add_user_message(self,content:str)->None:
@@ -39,11 +50,14 @@ class ContextManager:
         )
         self._messages.append(item)
         
-    def add_assistant_message(self,content:str)->None:
+    def add_assistant_message(self,content:str,token_count:int|None=None)->None:
+        # token_count may be supplied by a StreamingTokenCounter fed during the stream
+        if token_count is None:
+            token_count = count_tokens(content or "",self.model)
         item=MessageItem(
             role="assistant",
             content=content or "",
-            token_count=count_tokens(content or "",self.model)
+            token_count=token_count
         )
         self._messages.append(item)
         
@@ -61,7 +75,53 @@ class ContextManager:
         
         self._messages.append(item)
     
+    def load_messages(self,messages:list[dict[str,Any]])->None:
+        # Rebuild history (e.g. a resumed session) and count it in one batch
+        self._messages = [
+            MessageItem(
+                role=message["role"],
+                content=message.get("content") or "",
+                tool_call_id=message.get("tool_call_id"),
+                tool_calls=message.get("tool_calls") or [],
+            )
+            for message in messages
+            if message.get("role") != "system"
+        ]
+        # Earlier tool results may be gone; never point the model at them
+        self.read_cache.invalidate()
+        self._recount_tokens()
+        
+    def set_model(self,model:str)->None:
+        if model == self.model:
+            return
+        self.model = model
+        self._recount_tokens()
+        
+    def _recount_tokens(self)->None:
+        counts = count_tokens_batch(
+            [item.content for item in self._messages],
+            self.model,
+        )
+        for item, token_count in zip(self._messages, counts):
+            item.token_count = token_count
+            
+    def get_token_count(self)->int:
+        return sum(item.token_count or 0 for item in self._messages)
+
+    def get_request_token_count(self)->int:
+        # History plus the overhead every request carries regardless of history
+        return self.get_token_count() + self.tool_schema_tokens
+    
+    def record_usage(self,usage:TokenUsage,extra_texts:list[str]|None=None)->None:
+        # Recalibrate the token estimator against what the provider billed
+        # for the last request (system prompt + history + e.g. tool schemas)
+        sent = self._messages[:self._sent_message_count]
+        texts = [self._system_prompt, *(item.content for item in sent), *(extra_texts or [])]
+        prompt_tokens = usage.prompt_tokens - MESSAGE_OVERHEAD_TOKENS * (len(sent) + 1)
+        get_estimator().observe(self.model, texts, prompt_tokens)
+    
     def get_messages(self)->list[dict[str,Any]]:
+        self._sent_message_count = len(self._messages)
         message = []
         
         if self._system_prompt:
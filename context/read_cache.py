@@ -0,0 +1,253 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from utils.token_cache import content_key
+
+# Bound on the file contents kept for diffing, across all files of a session
+MAX_STORED_BYTES = 32 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileVersion:
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> "FileVersion":
+        return cls(stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+@dataclass
+class ReadRecord:
+    # Tool call whose result holds these lines; None if the caller had no id
+    call_id: str | None
+    start_line: int
+    end_line: int
+    total_lines: int | None
+
+
+class LineIntervals:
+    """
+    Disjoint, sorted line ranges [start, end] (1-based, inclusive), each
+    tagged with the tool call that delivered it. Lookups bisect on the
+    parallel start/end lists; adjacent ranges from different calls are kept
+    apart so every covered line can still be attributed.
+    """
+
+    def __init__(self) -> None:
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._call_ids: list[str | None] = []
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def overlaps(self, start: int, end: int) -> list[tuple[int, int, str | None]]:
+        """Covered parts of [start, end], clipped to it, in line order."""
+        # Disjoint and sorted, so ends are sorted too
+        first = bisect_left(self._ends, start)
+        last = bisect_right(self._starts, end)
+        return [
+            (max(self._starts[i], start), min(self._ends[i], end), self._call_ids[i])
+            for i in range(first, last)
+        ]
+
+    def gaps(self, start: int, end: int) -> list[tuple[int, int]]:
+        """Uncovered parts of [start, end], in line order."""
+        gaps = []
+        pos = start
+        for covered_start, covered_end, _ in self.overlaps(start, end):
+            if covered_start > pos:
+                gaps.append((pos, covered_start - 1))
+            pos = covered_end + 1
+        if pos <= end:
+            gaps.append((pos, end))
+        return gaps
+
+    def add(self, start: int, end: int, call_id: str | None) -> None:
+        # Only the gaps are new; already covered lines keep their first call
+        for gap_start, gap_end in self.gaps(start, end):
+            index = bisect_left(self._starts, gap_start)
+            self._starts.insert(index, gap_start)
+            self._ends.insert(index, gap_end)
+            self._call_ids.insert(index, call_id)
+
+
+@dataclass
+class FileEntry:
+    version: FileVersion
+    # (offset, limit) of an earlier request -> what it returned
+    ranges: dict[tuple[int, int | None], ReadRecord] = field(default_factory=dict)
+    # Lines of this version already delivered into the context
+    seen_lines: LineIntervals = field(default_factory=LineIntervals)
+
+
+@dataclass
+class SeenContent:
+    # Content-store key of the lines the model last received for this file
+    key: bytes
+    version: FileVersion
+    offset: int
+    limit: int | None
+    record: ReadRecord
+
+
+class ReadCache:
+    """
+    What file reads have already returned in the current context, per path
+    and file version: the result of each requested (offset, limit), and the
+    set of line ranges delivered so far.
+
+    Owned by the ContextManager: it is only valid while the tool results it
+    points at are still in the message history, so it is cleared whenever
+    that history is replaced.
+
+    It also keeps the last window of each file the model received, in a
+    content-addressed store (identical contents are held once), so a changed
+    file can be answered with a diff against what the model actually saw.
+
+    Clearing it starts a new epoch. A write may pass the epoch its read
+    started in; it is dropped if the cache was cleared since, so a cancelled
+    read that finishes late cannot record lines the context never got.
+    """
+
+    def __init__(self, max_stored_bytes: int = MAX_STORED_BYTES) -> None:
+        self.max_stored_bytes = max_stored_bytes
+        self._files: dict[str, FileEntry] = {}
+        self._seen: dict[str, SeenContent] = {}
+        # key -> (lines, size in characters)
+        self._contents: OrderedDict[bytes, tuple[tuple[str, ...], int]] = OrderedDict()
+        self._stored_bytes = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+
+    def _is_stale(self, epoch: int | None) -> bool:
+        return epoch is not None and epoch != self._epoch
+
+    def get(
+        self,
+        path: str,
+        version: FileVersion,
+        offset: int,
+        limit: int | None,
+    ) -> ReadRecord | None:
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None or entry.version != version:
+                return None
+            return entry.ranges.get((offset, limit))
+
+    def put(
+        self,
+        path: str,
+        version: FileVersion,
+        offset: int,
+        limit: int | None,
+        record: ReadRecord,
+        epoch: int | None = None,
+    ) -> None:
+        with self._lock:
+            if self._is_stale(epoch):
+                return
+            self._entry(path, version).ranges[(offset, limit)] = record
+
+    def seen_ranges(
+        self,
+        path: str,
+        version: FileVersion,
+        start: int,
+        end: int,
+    ) -> list[tuple[int, int, str | None]]:
+        """Parts of lines [start, end] of this version already in context."""
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None or entry.version != version:
+                return []
+            return entry.seen_lines.overlaps(start, end)
+
+    def mark_seen(
+        self,
+        path: str,
+        version: FileVersion,
+        start: int,
+        end: int,
+        call_id: str | None,
+        epoch: int | None = None,
+    ) -> None:
+        if end < start:
+            return
+        with self._lock:
+            if self._is_stale(epoch):
+                return
+            self._entry(path, version).seen_lines.add(start, end, call_id)
+
+    def _entry(self, path: str, version: FileVersion) -> FileEntry:
+        entry = self._files.get(path)
+        if entry is None or entry.version != version:
+            # The file changed; earlier ranges describe old content
+            entry = FileEntry(version)
+            self._files[path] = entry
+        return entry
+
+    def remember_content(
+        self,
+        path: str,
+        version: FileVersion,
+        offset: int,
+        limit: int | None,
+        lines: list[str],
+        record: ReadRecord,
+        epoch: int | None = None,
+    ) -> None:
+        text = "\n".join(lines)
+        key = content_key(text)
+        with self._lock:
+            if self._is_stale(epoch):
+                return
+            if key in self._contents:
+                self._contents.move_to_end(key)
+            else:
+                self._contents[key] = (tuple(lines), len(text))
+                self._stored_bytes += len(text)
+                # Oldest contents go first; their files simply get full reads
+                while self._stored_bytes > self.max_stored_bytes and len(self._contents) > 1:
+                    _, (_, size) = self._contents.popitem(last=False)
+                    self._stored_bytes -= size
+            self._seen[path] = SeenContent(key, version, offset, limit, record)
+
+    def last_content(self, path: str) -> tuple[SeenContent, tuple[str, ...]] | None:
+        with self._lock:
+            seen = self._seen.get(path)
+            if seen is None:
+                return None
+            stored = self._contents.get(seen.key)
+            if stored is None:
+                return None
+            return seen, stored[0]
+
+    def forget_content(self, path: str, epoch: int | None = None) -> None:
+        with self._lock:
+            if self._is_stale(epoch):
+                return
+            self._seen.pop(path, None)
+
+    def invalidate(self, path: str | None = None) -> None:
+        with self._lock:
+            if path is None:
+                self._epoch += 1
+                self._files.clear()
+                self._seen.clear()
+                self._contents.clear()
+                self._stored_bytes = 0
+            else:
+                self._files.pop(path, None)
+                self._seen.pop(path, None)
@@ -2,10 +2,14 @@ from __future__ import annotations
 import abc
 from enum import Enum
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from pydantic import BaseModel, ValidationError
 from dataclasses import dataclass, field
 from pydantic.json_schema import model_json_schema
+from pydantic_core import SchemaValidator
+
+if TYPE_CHECKING:
+    from context.read_cache import ReadCache
 
 class ToolKind(str,Enum):
     WRITE = "write"
@@ -69,6 +73,22 @@ class ToolInvocation:
     #current working directory
     cwd:Path
     params:dir[str,Any]
+    # Id of the tool call in the conversation, so results can refer back to it
+    call_id:str|None = None
+    # What reads have already put into the current context (per session)
+    read_cache:ReadCache|None = None
+    # read_cache.epoch when the call was scheduled; writes from a later epoch are dropped
+    read_cache_epoch:int|None = None
+    # params validated by the registry into the tool's schema model
+    validated_params:BaseModel|None = None
+
+def format_validation_errors(error:ValidationError)->list[str]:
+    errors = []
+    for item in error.errors(include_url=False):
+        field = ".".join(str(x) for x in item.get("loc",[]) )
+        msg=item.get("msg","Validation error")
+        errors.append(f"Parameter '{field}': {msg} ")
+    return errors
 
 class Tool(abc.ABC):
     name:str = "tool name"
@@ -85,22 +105,31 @@ class Tool(abc.ABC):
     async def execute(self,invocation:ToolInvocation)->ToolResult:
         pass
     
-    def validate_params(self,params:dict[str,Any])->list[str]:
+    def get_validator(self)->SchemaValidator|None:
+        # pydantic compiles the validator once per model class
         schema = self.schema
         if isinstance(schema,type) and issubclass(schema,BaseModel):
+            return schema.__pydantic_validator__
+        return None
+
+    def validate_params(self,params:dict[str,Any])->list[str]:
+        validator = self.get_validator()
+        if validator is not None:
             try:
-                schema(**params)
+                validator.validate_python(params)
             except ValidationError as e:
-                errors = []
-                for error in e.errors():
-                    field = ".".join(str(x) for x in error.get("loc",[]) )
-                    msg=error.get("msg","Validation error")
-                    errors.append(f"Parameter '{field}': {msg} ")
-                return errors
+                return format_validation_errors(e)
             except Exception as e:
                 return [str(e)]
         
         return []
+
+    def typed_params(self,invocation:ToolInvocation)->BaseModel:
+        """The invocation's params as the schema model, validated only if the registry has not."""
+        schema = self.schema
+        if isinstance(invocation.validated_params,schema):
+            return invocation.validated_params
+        return schema(**invocation.params)
     
     def is_mutating(self,params:dict[str,Any])->bool:
         return self.kind in {
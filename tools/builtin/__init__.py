@@ -1,12 +1,21 @@
 from tools.base import Tool
+from tools.builtin.read_archive import ReadArchiveTool
 from tools.builtin.read_file import ReadFileTool
+from tools.builtin.read_many_files import ReadManyFilesTool
+from tools.builtin.tail_file import TailFileTool
 
 __all__ = [
+    "ReadArchiveTool",
     "ReadFileTool",
+    "ReadManyFilesTool",
+    "TailFileTool",
 ]
 
 def get_all_builtin_tools():
     return [
         ReadFileTool(),  # Instance
+        ReadManyFilesTool(),
+        TailFileTool(),
+        ReadArchiveTool(),
     ]
     
\ No newline at end of file
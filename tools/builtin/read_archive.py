@@ -0,0 +1,161 @@
+from pydantic import BaseModel, Field
+
+from tools.base import Tool, ToolInvocation, ToolKind, ToolResult
+from tools.builtin.read_file import ReadFileTool
+from utils.archive import ArchiveIndex, get_archive_index, open_member
+from utils.async_io import run_blocking
+from utils.file_reader import PrefixedStream, read_stream_lines
+from utils.line_format import format_numbered
+from utils.paths import SNIFF_SIZE, FileProbe, probe_file, resolve_path, sniff_text
+from utils.text import count_tokens, truncate_text
+
+
+class ReadArchiveParams(BaseModel):
+    path: str = Field(
+        ...,
+        description="Path to a zip/wheel/jar or tar archive (.tar, .tar.gz, .tgz, .tar.bz2, .tar.xz)",
+    )
+
+    member: str | None = Field(
+        None,
+        description="Member to read, as listed. Leave empty to list the archive's members.",
+    )
+
+    offset: int = Field(
+        1,
+        ge=1,
+        description="line number of the member to start reading from (1-based not 0-based)",
+    )
+
+    limit: int | None = Field(
+        None,
+        ge=1,
+        description="Maximum number of lines to read. if not specified, read the whole member.",
+    )
+
+
+class ReadArchiveTool(Tool):
+    name = "Read_archive"
+    description = (
+        "List the members of a zip or tar archive (including compressed tarballs and wheels), "
+        "or read a text member with line numbers, without extracting anything to disk. "
+        "Use offset and limit for large members."
+    )
+    kind = ToolKind.READ
+
+    schema = ReadArchiveParams
+    MAX_OUTPUT_TOKENS = ReadFileTool.MAX_OUTPUT_TOKENS
+
+    async def execute(self, invocation: ToolInvocation):
+        params: ReadArchiveParams = self.typed_params(invocation)
+        return await run_blocking(self._probe_and_read, invocation, params)
+
+    def _probe_and_read(self, invocation: ToolInvocation, params: ReadArchiveParams):
+        path = resolve_path(invocation.cwd, params.path)
+        try:
+            probe = probe_file(path)
+        except OSError as e:
+            return ToolResult.error_result(f"failed to read archive: {e}")
+
+        with probe:
+            if not probe.exists:
+                return ToolResult.error_result(f"file not found {path}")
+            if not probe.is_file:
+                return ToolResult.error_result(f"path is not file {path}")
+            try:
+                index = get_archive_index(probe)
+                if index is None:
+                    return ToolResult.error_result(
+                        f"{path.name} is not a zip or tar archive"
+                    )
+                if params.member is None:
+                    return self._list(path, index)
+                return self._read_member(probe, index, params)
+            except Exception as e:
+                return ToolResult.error_result(f"failed to read archive: {e}")
+
+    def _list(self, path, index: ArchiveIndex) -> ToolResult:
+        members = list(index.members.values())
+        lines = [
+            f"{member.size:>12}  {member.name}{'/' if member.is_dir and not member.name.endswith('/') else ''}"
+            for member in members
+        ]
+        output = f"{index.kind} archive {path}: {len(members)} members (size in bytes, name)\n\n" + "\n".join(lines)
+        token_count = count_tokens(output, model="qwen/qwen3-coder:free", budget=self.MAX_OUTPUT_TOKENS)
+        truncated = token_count > self.MAX_OUTPUT_TOKENS
+        if truncated:
+            output = truncate_text(
+                output,
+                self.MAX_OUTPUT_TOKENS,
+                model="qwen/qwen3-coder:free",
+                suffix=f"\n... [truncated {len(members)} members]",
+            )
+        return ToolResult.success_result(
+            output=output,
+            truncated=truncated,
+            metadata={
+                "path": str(path),
+                "kind": index.kind,
+                "members": len(members),
+            },
+        )
+
+    def _read_member(self, probe: FileProbe, index: ArchiveIndex, params: ReadArchiveParams) -> ToolResult:
+        member = index.find(params.member)
+        if member is None:
+            return ToolResult.error_result(
+                f"no member {params.member} in {probe.path.name}; omit member to list them"
+            )
+        if member.is_dir:
+            return ToolResult.error_result(f"{member.name} is a directory")
+
+        content = probe.open() if index.kind == "zip" else probe.open_content()
+        with content:
+            stream = open_member(content, index, member)
+            head = stream.read(SNIFF_SIZE)
+            is_binary, encoding, _ = sniff_text(head)
+            if is_binary:
+                return ToolResult.error_result(
+                    f"Cannot read binary member: {member.name}. This tool only reads text members."
+                )
+            if encoding in ("utf-16", "utf-32"):
+                return ToolResult.error_result(
+                    f"{member.name} is {encoding}-encoded; extract it and use Read_file instead."
+                )
+            # Members are streamed like large files: stop once the window or
+            # token budget is filled
+            file_range = read_stream_lines(
+                PrefixedStream(head, stream),
+                params.offset,
+                params.limit,
+                encoding,
+                max_tokens=self.MAX_OUTPUT_TOKENS,
+                model="qwen/qwen3-coder:free",
+                line_overhead_tokens=ReadFileTool.LINE_NUMBER_TOKENS,
+            )
+
+        total_lines = file_range.total_lines
+        if total_lines == 0:
+            return ToolResult.success_result("Member is empty.", metadata={"lines": 0})
+
+        start = params.offset
+        end = file_range.end_line
+        output = "\n".join(format_numbered(file_range.lines, start))
+        if total_lines is None:
+            header = (
+                f"Showing lines {start}-{end} of {member.name} ({member.size / (1024 * 1024):.1f}MB; "
+                f"total line count not computed; use offset to continue)"
+            )
+        else:
+            header = f"Showing lines {start}-{end} of {total_lines} of {member.name}"
+        return ToolResult.success_result(
+            output=f"{header}\n\n{output}",
+            truncated=file_range.truncated,
+            metadata={
+                "path": str(probe.path),
+                "member": member.name,
+                "total_lines": total_lines,
+                "shown_s": start,
+                "shown_end": end,
+            },
+        )
@@ -1,8 +1,13 @@
 from pydantic import BaseModel,Field
 
+from context.read_cache import FileVersion, ReadCache, ReadRecord
 from tools.base import Tool, ToolInvocation, ToolKind, ToolResult
-from utils.paths import is_binary_file, resolve_path
-from utils.text import count_tokens, truncate_text
+from utils.async_io import run_blocking
+from utils.file_reader import LineRange, decode_text, read_line_range, stream_line_range
+from utils.line_format import COMPACT_LEGEND, LineFormat, format_lines
+from utils.outline import get_outline
+from utils.paths import DECOMPRESSION_ERRORS, FileProbe, probe_file, resolve_path
+from utils.text import count_tokens, diff_lines, truncate_text
 
 
 class ReadFileParams(BaseModel):
@@ -22,56 +27,134 @@ class ReadFileParams(BaseModel):
         ge=1,
         description="Maximum number of lines to read .if not specified, read entire file.",
     )
+    
+    outline: bool = Field(
+        False,
+        description=(
+            "Python files only: return classes, functions with signatures, docstring "
+            "first lines and constants with their line ranges instead of the content. "
+            "Then read the ranges you need with offset/limit."
+        ),
+    )
+    
+    format: LineFormat = Field(
+        LineFormat.NUMBERED,
+        description=(
+            "'numbered' prefixes every line with its number. 'compact' numbers only "
+            "some lines, using fewer tokens for large reads."
+        ),
+    )
 
 class ReadFileTool(Tool):
     name="Read_file"
     description = (
         "Read the content of a text file. returns the file content with line number."
-        "For large files, use offset and limit to read specific portions."
+        "For large files, use offset and limit to read specific portions; files of any size can be read."
         "cannot read binary files (images, executables, etc.)."
     )
     kind =ToolKind.READ
     
     schema= ReadFileParams
-    MAX_FILE_SIZE=1024*1024*10 #to config file
+    # Tokens taken by the "{i:6}|" line number prefix
+    LINE_NUMBER_TOKENS=3
     MAX_OUTPUT_TOKENS=25000 #to config file
     
     async def execute(self, invocation:ToolInvocation):
-        params = ReadFileParams(**invocation.params)
+        params: ReadFileParams = self.typed_params(invocation)
+        # resolve, stat, read and tokenize all block; keep them off the event loop
+        return await run_blocking(self._probe_and_read, invocation, params)
+
+    def _probe_and_read(self, invocation:ToolInvocation, params:ReadFileParams):
         path = resolve_path(invocation.cwd,params.path)
-        
-        if not path.exists():
+        try:
+            probe = probe_file(path)
+        except OSError as e:
+            return ToolResult.error_result(
+                f"failed to read file: {e}"
+            )
+
+        with probe:
+            return self._read(probe, params, invocation)
+
+    @classmethod
+    def read_lines(cls, probe:FileProbe, offset:int, limit:int|None, max_tokens:int)->LineRange:
+        # Reading stops once the line window and token budget are filled.
+        # Plain files of any size go through the mmap and the cached line
+        # index, so seeking deep into a huge log costs no rescan. UTF-16/32
+        # files are streamed (the newline byte scan needs UTF-8), as are
+        # compressed files, decompressed on the fly and never in full.
+        streaming = (
+            probe.encoding in ("utf-16", "utf-32")
+            or probe.compression is not None
+        )
+        with probe.open_content() as f:
+            if streaming:
+                try:
+                    return stream_line_range(
+                        probe.path,
+                        offset,
+                        limit,
+                        probe.encoding,
+                        max_tokens=max_tokens,
+                        model="qwen/qwen3-coder:free",
+                        line_overhead_tokens=cls.LINE_NUMBER_TOKENS,
+                        stream=f,
+                    )
+                except DECOMPRESSION_ERRORS as e:
+                    if probe.compression is None:
+                        raise
+                    # Damage past the sniffed head only shows up mid-stream
+                    raise OSError(f"corrupt {probe.compression} data in {probe.path.name}: {e}") from e
+            # Only the requested window is decoded; the file is never split into lines
+            return read_line_range(
+                probe.path,
+                offset,
+                limit,
+                probe.encoding,
+                stream=f,
+                max_tokens=max_tokens,
+                model="qwen/qwen3-coder:free",
+                line_overhead_tokens=cls.LINE_NUMBER_TOKENS,
+            )
+
+    def _read(self, probe:FileProbe, params:ReadFileParams, invocation:ToolInvocation):
+        path = probe.path
+        if not probe.exists:
             return ToolResult.error_result(
                 f"file not found{path}"
             )
             
-        if not path.is_file():
+        if not probe.is_file:
             return ToolResult.error_result(
                 f"path is not file {path}"
             )
         
-        file_size = path.stat().st_size
-        
-        if file_size > self.MAX_FILE_SIZE:
-            return ToolResult.error_result(
-                f"File too large ({file_size/(1024*1024):.1f}MB)."
-                f"Maximum is {self.MAX_FILE_SIZE/(1024*1024):.0f}MB"
-                )
-            
-        if is_binary_file(path):
+        file_size = probe.size
+        if probe.is_binary:
             return ToolResult.error_result(
                 f"Cannot read binary file: {path.name}"
                 "This tool only reads text files."
             )
             
-        try:
-            try :
-                content = path.read_text(encoding='utf-8')
-            except UnicodeDecodeError:
-                content = path.read_text(encoding='latin-1')
+        if params.outline:
+            return self._outline(probe)
             
-            lines= content.splitlines()
-            total_lines=len(lines)
+        read_cache = invocation.read_cache
+        epoch = invocation.read_cache_epoch
+        version = FileVersion.from_stat(probe.stat)
+        if read_cache is not None:
+            previous = read_cache.get(str(path), version, params.offset, params.limit)
+            if previous is not None:
+                return self._unchanged_result(path, previous)
+            
+        try:
+            file_range = self.read_lines(
+                probe,
+                params.offset,
+                params.limit,
+                max_tokens=self.MAX_OUTPUT_TOKENS,
+            )
+            total_lines = file_range.total_lines
             
             if total_lines==0:
                 return ToolResult.success_result(
@@ -82,41 +165,93 @@ class ReadFileTool(Tool):
                 )
             
             start_idx = max(0,params.offset - 1)
-
-            if params.limit is not None:
-                end_idx = min(start_idx + params.limit , total_lines)
-            else:
-                end_idx = total_lines
-                    
-            selected_lines = lines[start_idx:end_idx]
+            selected_lines = file_range.lines
+            end_idx = start_idx + len(selected_lines)
             
-            formatted_lines = []
-            
-            for i, line in enumerate(selected_lines,start = start_idx+1):
-                formatted_lines.append(f"{i:6}|{line}")
+            formatted_lines = format_lines(selected_lines, start_idx+1, params.format)
                 
             output = "\n".join(formatted_lines)
-            token_count = count_tokens(output,model="qwen/qwen3-coder:free")
+            token_count = count_tokens(
+                output,
+                model="qwen/qwen3-coder:free",
+                budget=self.MAX_OUTPUT_TOKENS,
+            )
+            
+            truncated = file_range.truncated
+            record = ReadRecord(
+                call_id=invocation.call_id,
+                start_line=start_idx+1,
+                end_line=end_idx,
+                total_lines=total_lines,
+            )
+            if read_cache is not None and not truncated:
+                diff_result = self._diff_result(
+                    read_cache, path, version, params, selected_lines, record, token_count, epoch,
+                )
+                if diff_result is not None:
+                    return diff_result
+            
+            seen = []
+            if read_cache is not None and selected_lines:
+                seen = read_cache.seen_ranges(str(path), version, start_idx+1, end_idx)
+            if seen:
+                # Part of the window is already in context: send only the rest
+                formatted_lines = self._skip_seen_lines(selected_lines, start_idx+1, seen, params.format)
+                if formatted_lines is None:
+                    read_cache.put(str(path), version, params.offset, params.limit, record, epoch=epoch)
+                    return self._already_seen_result(path, record, seen)
+                output = "\n".join(formatted_lines)
+                token_count = count_tokens(
+                    output,
+                    model="qwen/qwen3-coder:free",
+                    budget=self.MAX_OUTPUT_TOKENS,
+                )
             
-            truncated = False
+            output_cut = False
             if token_count > self.MAX_OUTPUT_TOKENS: 
                 output = truncate_text(
                     output,
                     self.MAX_OUTPUT_TOKENS,
-                    suffix=f"\n... [truncated {total_lines} total lines]"
+                    model="qwen/qwen3-coder:free",
+                    suffix=f"\n... [truncated {total_lines or end_idx} total lines]"
                 )
                 truncated= True
+                # Lines past the cut never reached the model
+                output_cut = True
                 
             metadata_lins = []
-            if start_idx > 0 or end_idx < total_lines:
+            if total_lines is None:
+                # Streaming read stopped early; the total was never counted
+                metadata_lins.append(
+                    f"Showing lines {start_idx + 1}-{end_idx} of a {file_size/(1024*1024):.1f}MB"
+                    f"{f' {probe.compression}-compressed' if probe.compression else ''} file "
+                    f"(total line count not computed; use offset to continue)"
+                    )
+            elif start_idx > 0 or end_idx < total_lines:
                 metadata_lins.append(
                     f"Showing lines {start_idx + 1}-{end_idx} of {total_lines }"
                     )
+            if params.format == LineFormat.COMPACT:
+                metadata_lins.append(COMPACT_LEGEND)
                 
             if metadata_lins:
                 header = " | ".join(metadata_lins)+"\n\n"
                 output = header + output
             
+            if read_cache is not None:
+                if not output_cut:
+                    # A repeat of this read may be answered with a stub
+                    # only if every line of `record` was actually sent
+                    read_cache.put(str(path), version, params.offset, params.limit, record, epoch=epoch)
+                if truncated:
+                    # The model never saw the whole window; nothing to diff against
+                    read_cache.forget_content(str(path), epoch=epoch)
+                else:
+                    read_cache.remember_content(
+                        str(path), version, params.offset, params.limit, selected_lines, record, epoch=epoch,
+                    )
+                    read_cache.mark_seen(str(path), version, start_idx+1, end_idx, invocation.call_id, epoch=epoch)
+            
             return ToolResult.success_result(
                 output=output,
                 truncated = truncated,
@@ -130,4 +265,170 @@ class ReadFileTool(Tool):
         except Exception as e:
             return ToolResult.error_result(
                 f"failed to read file: {e}"
-            )
\ No newline at end of file
+            )
+    
+    def _diff_result(
+        self,
+        read_cache:ReadCache,
+        path,
+        version:FileVersion,
+        params:ReadFileParams,
+        lines:list[str],
+        record:ReadRecord,
+        full_tokens:int,
+        epoch:int|None = None,
+    )->ToolResult|None:
+        # Only diff a window the model already saw whole, and only when the
+        # diff is smaller than sending the window again
+        last = read_cache.last_content(str(path))
+        if last is None:
+            return None
+        seen, seen_lines = last
+        if seen.version == version or (seen.offset, seen.limit) != (params.offset, params.limit):
+            return None
+        
+        diff = diff_lines(
+            seen_lines,
+            lines,
+            first_line=record.start_line,
+            max_tokens=min(full_tokens, self.MAX_OUTPUT_TOKENS) - 1,
+            model="qwen/qwen3-coder:free",
+        )
+        if diff is None:
+            return None
+        
+        read_cache.put(str(path), version, params.offset, params.limit, record, epoch=epoch)
+        read_cache.remember_content(str(path), version, params.offset, params.limit, lines, record, epoch=epoch)
+        read_cache.mark_seen(str(path), version, record.start_line, record.end_line, record.call_id, epoch=epoch)
+        if not diff:
+            return self._unchanged_result(path, seen.record)
+        
+        where = (
+            f"tool call {seen.record.call_id}"
+            if seen.record.call_id
+            else "your earlier Read_file result"
+        )
+        total = f" of {record.total_lines}" if record.total_lines is not None else ""
+        return ToolResult.success_result(
+            f"[changed] {path} was modified since {where}. Showing only the changes "
+            f"to lines {record.start_line}-{record.end_line}{total} as a unified diff "
+            f"(hunk headers give file line numbers):\n\n"
+            f"--- {path} (previous read)\n+++ {path} (now)\n{diff}",
+            metadata = {
+                "path":str(path),
+                "total_lines":record.total_lines,
+                "shown_s":record.start_line,
+                "shown_end":record.end_line,
+                "diff":True,
+                "previous_call_id":seen.record.call_id,
+            },
+        )
+    
+    def _outline(self, probe:FileProbe)->ToolResult:
+        path = probe.path
+        if path.suffix not in (".py", ".pyi"):
+            return ToolResult.error_result(
+                f"outline is only available for Python files: {path.name}. "
+                "Read it with offset/limit instead."
+            )
+        
+        def read_source()->str:
+            with probe.open() as f:
+                return decode_text(f.read(), probe.encoding)
+        
+        try:
+            outline = get_outline(str(path), probe.stat.st_mtime_ns, probe.size, read_source)
+        except SyntaxError as e:
+            return ToolResult.error_result(
+                f"cannot outline {path.name}: syntax error at line {e.lineno}: {e.msg}. "
+                "Read it with offset/limit instead."
+            )
+        
+        output = (
+            f"Outline of {path} (line ranges on the left; read bodies with offset/limit)\n\n"
+            f"{outline or '(no definitions)'}"
+        )
+        token_count = count_tokens(output, model="qwen/qwen3-coder:free", budget=self.MAX_OUTPUT_TOKENS)
+        truncated = token_count > self.MAX_OUTPUT_TOKENS
+        if truncated:
+            output = truncate_text(output, self.MAX_OUTPUT_TOKENS, model="qwen/qwen3-coder:free")
+        return ToolResult.success_result(
+            output=output,
+            truncated=truncated,
+            metadata = {
+                "path":str(path),
+                "outline":True,
+            },
+        )
+    
+    @staticmethod
+    def _seen_where(call_id:str|None)->str:
+        return f"tool call {call_id}" if call_id else "an earlier Read_file result"
+    
+    def _skip_seen_lines(
+        self,
+        lines:list[str],
+        first_line:int,
+        seen:list[tuple[int,int,str|None]],
+        line_format:LineFormat,
+    )->list[str]|None:
+        # Replace every already-delivered run with one marker line; None if
+        # nothing new is left. Each remaining run is formatted on its own so
+        # compact numbering restarts with an anchor after every marker.
+        result = []
+        pos = first_line
+        for seen_start, seen_end, call_id in seen:
+            result.extend(format_lines(lines[pos - first_line:seen_start - first_line], pos, line_format))
+            result.append(
+                f"{'...':>6}|[lines {seen_start}-{seen_end} unchanged, already in context "
+                f"from {self._seen_where(call_id)}]"
+            )
+            pos = seen_end + 1
+        result.extend(format_lines(lines[pos - first_line:], pos, line_format))
+        if len(result) == len(seen):
+            return None
+        return result
+    
+    def _already_seen_result(
+        self,
+        path,
+        record:ReadRecord,
+        seen:list[tuple[int,int,str|None]],
+    )->ToolResult:
+        parts = ", ".join(
+            f"{start}-{end} ({self._seen_where(call_id)})" for start, end, call_id in seen
+        )
+        return ToolResult.success_result(
+            f"[unchanged] lines {record.start_line}-{record.end_line} of {path} are all "
+            f"already in context, unchanged: lines {parts}. "
+            f"Use a different offset/limit to read other lines.",
+            metadata = {
+                "path":str(path),
+                "total_lines":record.total_lines,
+                "shown_s":record.start_line,
+                "shown_end":record.end_line,
+                "unchanged":True,
+                "previous_call_id":seen[0][2],
+            },
+        )
+    
+    def _unchanged_result(self, path, previous:ReadRecord)->ToolResult:
+        # Same file version and window as an earlier result still in context
+        where = (
+            f"the result of tool call {previous.call_id}"
+            if previous.call_id
+            else "an earlier Read_file result"
+        )
+        return ToolResult.success_result(
+            f"[unchanged] {path} has not changed since {where}; "
+            f"lines {previous.start_line}-{previous.end_line} are already in context there. "
+            f"Use a different offset/limit to read other lines.",
+            metadata = {
+                "path":str(path),
+                "total_lines":previous.total_lines,
+                "shown_s":previous.start_line,
+                "shown_end":previous.end_line,
+                "unchanged":True,
+                "previous_call_id":previous.call_id,
+            },
+        )
@@ -0,0 +1,256 @@
+import asyncio
+import glob
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from itertools import accumulate
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from tools.base import Tool, ToolInvocation, ToolKind, ToolResult
+from tools.builtin.read_file import ReadFileTool
+from utils.async_io import run_blocking
+from utils.paths import probe_file, resolve_path
+from utils.text import count_tokens_batch
+
+# "path:START-END", or "path:START" to read from START on; digits only, so a
+# Windows drive letter ("C:\...") is never taken for a range
+RANGE_SUFFIX = re.compile(r":(\d+)(?:-(\d*))?$")
+GLOB_CHARS = re.compile(r"[*?\[]")
+# Tokens taken by a "==> path (lines a-b of N) <==" header
+HEADER_TOKENS = 20
+# A proportional share this small is not worth truncating a file to
+MIN_SHARE_TOKENS = 200
+
+
+class BudgetStrategy(str, Enum):
+    # Every file gets a share of the budget matching its size; files smaller
+    # than their share are shown whole
+    PROPORTIONAL = "proportional"
+    # Smaller files are shown whole first; what is left goes to the next one
+    SMALLEST_FIRST = "smallest_first"
+
+
+class ReadManyFilesParams(BaseModel):
+    paths: list[str] = Field(
+        ...,
+        min_length=1,
+        description=(
+            "Files or glob patterns (relative to working directory or absolute). "
+            "Append ':START-END' to read only lines START..END (1-based, inclusive), "
+            "e.g. 'src/app.py:10-80' or 'src/**/*.py'."
+        ),
+    )
+
+    budget_strategy: BudgetStrategy = Field(
+        BudgetStrategy.PROPORTIONAL,
+        description=(
+            "How the output token budget is split when everything does not fit: "
+            "'proportional' truncates every file by the same ratio, "
+            "'smallest_first' shows small files whole and truncates the largest."
+        ),
+    )
+
+
+@dataclass
+class FileSpec:
+    path: Path
+    offset: int = 1
+    limit: int | None = None
+
+
+@dataclass
+class FileRead:
+    spec: FileSpec
+    error: str | None = None
+    total_lines: int | None = None
+    lines: list[str] = field(default_factory=list)
+    # Tokens of each formatted line, line number and newline included
+    line_tokens: list[int] = field(default_factory=list)
+    # Streaming read stopped early, or lines were dropped to fit the budget
+    truncated: bool = False
+
+    @property
+    def tokens(self) -> int:
+        return HEADER_TOKENS + sum(self.line_tokens)
+
+
+class ReadManyFilesTool(Tool):
+    name = "Read_many_files"
+    description = (
+        "Read several text files in one call, returned with line numbers. "
+        "Accepts paths, glob patterns and per-file line ranges. Prefer this over "
+        "repeated Read_file calls when you already know which files you need. "
+        "Output is limited to one shared token budget; long files are truncated."
+    )
+    kind = ToolKind.READ
+
+    schema = ReadManyFilesParams
+    MAX_FILES = 50
+    MAX_OUTPUT_TOKENS = ReadFileTool.MAX_OUTPUT_TOKENS
+
+    async def execute(self, invocation: ToolInvocation):
+        params: ReadManyFilesParams = self.typed_params(invocation)
+        specs = await run_blocking(self._expand, invocation.cwd, params.paths)
+        if not specs:
+            return ToolResult.error_result(
+                f"no files matched: {', '.join(params.paths)}"
+            )
+
+        skipped = len(specs) - self.MAX_FILES
+        specs = specs[:self.MAX_FILES]
+        reads = await asyncio.gather(*(run_blocking(self._read, spec) for spec in specs))
+
+        self._apply_budget(reads, self.MAX_OUTPUT_TOKENS, params.budget_strategy)
+        blocks = [self._format(read) for read in reads]
+        if skipped > 0:
+            blocks.append(f"... [{skipped} more files not read; limit is {self.MAX_FILES} per call]")
+
+        failed = [read for read in reads if read.error]
+        output = "\n\n".join(blocks)
+        metadata = {
+            "files": [
+                {
+                    "path": str(read.spec.path),
+                    "total_lines": read.total_lines,
+                    "shown": len(read.lines),
+                    "error": read.error,
+                }
+                for read in reads
+            ],
+        }
+        if len(failed) == len(reads):
+            return ToolResult.error_result(
+                "none of the files could be read",
+                output=output,
+                metadata=metadata,
+            )
+        return ToolResult.success_result(
+            output=output,
+            truncated=skipped > 0 or any(read.truncated for read in reads),
+            metadata=metadata,
+        )
+
+    def _expand(self, cwd: Path, entries: list[str]) -> list[FileSpec]:
+        specs: list[FileSpec] = []
+        seen: set[tuple[Path, int, int | None]] = set()
+        for entry in entries:
+            offset, limit = 1, None
+            match = RANGE_SUFFIX.search(entry)
+            if match:
+                entry = entry[:match.start()]
+                offset = max(1, int(match.group(1)))
+                if match.group(2):
+                    limit = max(1, int(match.group(2)) - offset + 1)
+
+            if GLOB_CHARS.search(entry):
+                pattern = str(resolve_path(cwd, entry))
+                paths = [
+                    Path(p) for p in sorted(glob.glob(pattern, recursive=True))
+                    if Path(p).is_file()
+                ]
+            else:
+                paths = [resolve_path(cwd, entry)]
+
+            for path in paths:
+                key = (path, offset, limit)
+                if key not in seen:
+                    seen.add(key)
+                    specs.append(FileSpec(path=path, offset=offset, limit=limit))
+        return specs
+
+    def _read(self, spec: FileSpec) -> FileRead:
+        result = FileRead(spec=spec)
+        try:
+            with probe_file(spec.path) as probe:
+                if not probe.exists:
+                    result.error = "file not found"
+                elif not probe.is_file:
+                    result.error = "path is not a file"
+                elif probe.is_binary:
+                    result.error = "binary file"
+                else:
+                    file_range = ReadFileTool.read_lines(
+                        probe,
+                        spec.offset,
+                        spec.limit,
+                        max_tokens=self.MAX_OUTPUT_TOKENS,
+                    )
+                    result.total_lines = file_range.total_lines
+                    result.lines = [
+                        f"{i:6}|{line}"
+                        for i, line in enumerate(file_range.lines, start=spec.offset)
+                    ]
+                    result.line_tokens = [
+                        tokens + 1
+                        for tokens in count_tokens_batch(result.lines, model="qwen/qwen3-coder:free")
+                    ]
+                    result.truncated = file_range.truncated
+        except Exception as e:
+            result.error = f"failed to read file: {e}"
+        return result
+
+    def _apply_budget(
+        self,
+        reads: list[FileRead],
+        budget: int,
+        strategy: BudgetStrategy,
+    ) -> None:
+        total = sum(read.tokens for read in reads)
+        if total <= budget:
+            return
+
+        allowances = {}
+        remaining = budget
+        for read in sorted(reads, key=lambda r: r.tokens):
+            if strategy == BudgetStrategy.SMALLEST_FIRST:
+                allowance = min(read.tokens, remaining)
+            else:
+                # Share of what is left, never cut below MIN_SHARE_TOKENS;
+                # files smaller than their share hand the surplus on to the
+                # larger ones after them
+                share = max(remaining * read.tokens // total, MIN_SHARE_TOKENS)
+                allowance = min(read.tokens, share, remaining)
+                total -= read.tokens
+            allowances[id(read)] = allowance
+            remaining -= allowance
+
+        for read in reads:
+            allowance = allowances[id(read)] - HEADER_TOKENS
+            if allowance >= read.tokens - HEADER_TOKENS:
+                continue
+            # Keep whole lines while their running token total fits
+            keep = 0
+            for keep, running in enumerate(accumulate(read.line_tokens)):
+                if running > allowance:
+                    break
+            else:
+                keep = len(read.line_tokens)
+            del read.lines[keep:]
+            del read.line_tokens[keep:]
+            read.truncated = True
+
+    def _format(self, read: FileRead) -> str:
+        spec = read.spec
+        if read.error:
+            return f"==> {spec.path} <==\nError: {read.error}"
+        if read.total_lines == 0:
+            return f"==> {spec.path} (empty) <==\n"
+
+        if not read.lines and not read.truncated:
+            return f"==> {spec.path} (no lines from {spec.offset}; file has {read.total_lines}) <==\n"
+
+        if not read.lines:
+            return (
+                f"==> {spec.path} <==\n"
+                f"... [not shown: over the token budget; use Read_file with offset={spec.offset}]"
+            )
+
+        end = spec.offset + len(read.lines) - 1
+        of_total = f" of {read.total_lines}" if read.total_lines is not None else ""
+        header = f"==> {spec.path} (lines {spec.offset}-{end}{of_total}) <=="
+        body = "\n".join(read.lines)
+        if read.truncated:
+            body += f"\n... [truncated; use Read_file with offset={end + 1} to continue]"
+        return f"{header}\n{body}"
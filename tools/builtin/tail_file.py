@@ -0,0 +1,127 @@
+from pydantic import BaseModel, Field
+
+from tools.base import Tool, ToolInvocation, ToolKind, ToolResult
+from tools.builtin.read_file import ReadFileTool
+from utils.async_io import run_blocking
+from utils.file_reader import read_since, read_tail
+from utils.paths import FileProbe, probe_file, resolve_path
+
+
+class TailFileParams(BaseModel):
+    path: str = Field(
+        ...,
+        description="Path to the file (relative to working directory or absolute path)",
+    )
+
+    lines: int = Field(
+        100,
+        ge=1,
+        le=10000,
+        description="Maximum number of lines to return.",
+    )
+
+    since_offset: int | None = Field(
+        None,
+        ge=0,
+        description=(
+            "Follow mode: return the complete lines appended after this byte offset "
+            "(use next_offset from the previous call) instead of the last lines."
+        ),
+    )
+
+
+class TailFileTool(Tool):
+    name = "Tail_file"
+    description = (
+        "Read the last lines of a text file, e.g. a log, without scanning the whole file. "
+        "Cost depends only on the output size, so it is safe on multi-GB files. "
+        "Pass since_offset to follow a growing file from where the last call stopped."
+    )
+    kind = ToolKind.READ
+
+    schema = TailFileParams
+    MAX_OUTPUT_TOKENS = ReadFileTool.MAX_OUTPUT_TOKENS
+
+    async def execute(self, invocation: ToolInvocation):
+        params: TailFileParams = self.typed_params(invocation)
+        return await run_blocking(self._probe_and_tail, invocation, params)
+
+    def _probe_and_tail(self, invocation: ToolInvocation, params: TailFileParams):
+        path = resolve_path(invocation.cwd, params.path)
+        try:
+            probe = probe_file(path)
+        except OSError as e:
+            return ToolResult.error_result(f"failed to read file: {e}")
+
+        with probe:
+            if not probe.exists:
+                return ToolResult.error_result(f"file not found {path}")
+            if not probe.is_file:
+                return ToolResult.error_result(f"path is not file {path}")
+            if probe.is_binary:
+                return ToolResult.error_result(
+                    f"Cannot read binary file: {path.name}. This tool only reads text files."
+                )
+            if probe.encoding in ("utf-16", "utf-32") or probe.compression:
+                return ToolResult.error_result(
+                    f"{path.name} is {probe.compression or probe.encoding}-encoded and cannot "
+                    "be read backwards; use Read_file instead."
+                )
+            try:
+                return self._tail(probe, params)
+            except Exception as e:
+                return ToolResult.error_result(f"failed to read file: {e}")
+
+    def _tail(self, probe: FileProbe, params: TailFileParams) -> ToolResult:
+        path = probe.path
+        size = probe.size
+        notes = []
+        since = params.since_offset
+        if since is not None and since > size:
+            # Truncated or rotated since the last call: start over from the end
+            notes.append(f"file shrank below offset {since} (truncated or rotated); showing its last lines")
+            since = None
+
+        with probe.open() as f:
+            if since is None:
+                tail = read_tail(
+                    f,
+                    size,
+                    params.lines,
+                    probe.encoding,
+                    max_tokens=self.MAX_OUTPUT_TOKENS,
+                    model="qwen/qwen3-coder:free",
+                )
+                what = f"Last {len(tail.lines)} lines"
+            else:
+                tail = read_since(
+                    f,
+                    since,
+                    params.lines,
+                    probe.encoding,
+                    max_tokens=self.MAX_OUTPUT_TOKENS,
+                    model="qwen/qwen3-coder:free",
+                )
+                what = f"{len(tail.lines)} new lines"
+
+        next_offset = tail.resume_offset
+        header = f"{what} of {path} (bytes {tail.start_offset}-{tail.end_offset} of {size})"
+        if since is not None and tail.truncated:
+            notes.append(f"more lines follow; call again with since_offset={next_offset}")
+        elif since is None and tail.truncated:
+            notes.append("earlier lines not shown; use Read_file with offset/limit for them")
+        if since is None or not tail.truncated:
+            notes.append(f"to follow new output call again with since_offset={next_offset}")
+
+        output = "\n".join([" | ".join([header, *notes]), "", *tail.lines])
+        return ToolResult.success_result(
+            output=output,
+            truncated=tail.truncated,
+            metadata={
+                "path": str(path),
+                "size": size,
+                "start_offset": tail.start_offset,
+                "next_offset": next_offset,
+                "lines": len(tail.lines),
+            },
+        )
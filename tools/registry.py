@@ -1,25 +1,45 @@
+import json
 import logging
 from pathlib import Path
-from typing import Any
-from tools.base import Tool, ToolInvocation, ToolResult
+from typing import TYPE_CHECKING, Any
+from pydantic import BaseModel, ValidationError
+from pydantic_core import SchemaValidator
+from tools.base import Tool, ToolInvocation, ToolResult, format_validation_errors
 from tools.builtin import get_all_builtin_tools
+from utils.text import count_tokens
+
+if TYPE_CHECKING:
+    from context.read_cache import ReadCache
 
 logger = logging.getLogger(__name__)
 
 class ToolRegistry:
     def __init__(self) -> None:
         self._tools:dict[str,Tool] = {}
+        # Compiled parameter validator per tool (None: no pydantic schema)
+        self._validators:dict[str,SchemaValidator|None] = {}
+        # Bumped on every register/unregister; the cached schema payload
+        # below is valid for one version only
+        self._version = 0
+        self._schemas:list[dict[str,Any]]|None = None
+        self._payload:list[dict[str,Any]]|None = None
+        self._payload_json:str|None = None
+        self._token_counts:dict[str,int] = {}
     
     def register(self,tool:Tool)->None:
         if tool.name in self._tools:
             logger.warning(f"overwriting exiting tool:{tool.name}")
             
         self._tools[tool.name]=tool
+        self._validators[tool.name]=tool.get_validator()
+        self._invalidate_schemas()
         logger.debug(f"Registered tool:{tool.name}")
         
     def unregister(self,name:str)->bool:
         if name in self._tools:
             del self._tools[name]
+            self._validators.pop(name, None)
+            self._invalidate_schemas()
             return True
         
         return False
@@ -34,10 +54,55 @@ class ToolRegistry:
             tools.append(tool)    
         return tools
     
+    @property
+    def version(self)->int:
+        return self._version
+
+    def _invalidate_schemas(self)->None:
+        self._version += 1
+        self._schemas = None
+        self._payload = None
+        self._payload_json = None
+        self._token_counts.clear()
+
     def get_schemas(self)->list[dict[str,Any]]:
-        return [tool.to_openai_schema() for tool in self.get_tools()]
+        # Built once per registry version; callers must not mutate the result
+        if self._schemas is None:
+            self._schemas = [tool.to_openai_schema() for tool in self.get_tools()]
+        return self._schemas
+
+    def get_tools_payload(self)->list[dict[str,Any]]:
+        """The request's "tools" list, prebuilt for LLMClient."""
+        if self._payload is None:
+            self._payload = [
+                {"type":"function","function":schema}
+                for schema in self.get_schemas()
+            ]
+        return self._payload
+
+    def get_tools_payload_json(self)->str:
+        if self._payload_json is None:
+            self._payload_json = json.dumps(self.get_tools_payload())
+        return self._payload_json
+
+    def get_schema_token_count(self,model:str)->int:
+        """Tokens the tool definitions add to every request (fixed overhead)."""
+        if model not in self._token_counts:
+            payload = self.get_tools_payload()
+            self._token_counts[model] = (
+                count_tokens(self.get_tools_payload_json(),model) if payload else 0
+            )
+        return self._token_counts[model]
         
-    async def invoke(self,name:str,parameters:dict[str,Any],cwd:Path)->ToolResult:
+    async def invoke(
+        self,
+        name:str,
+        parameters:dict[str,Any],
+        cwd:Path,
+        call_id:str|None=None,
+        read_cache:"ReadCache|None"=None,
+        read_cache_epoch:int|None=None,
+    )->ToolResult:
         tool=self.get(name)
         if tool is None:
             return ToolResult.error_result(
@@ -45,7 +110,7 @@ class ToolRegistry:
                 metadata={"tool_name":name} 
             )
         
-        validation_errors = tool.validate_params(parameters)
+        validated_params, validation_errors = self._validate(tool, parameters)
         
         if validation_errors:
             return ToolResult.error_result(
@@ -55,7 +120,15 @@ class ToolRegistry:
         
         invocation = ToolInvocation(
             cwd=cwd or Path.cwd(),
-            params=parameters
+            params=parameters,
+            call_id=call_id,
+            read_cache=read_cache,
+            read_cache_epoch=(
+                read_cache.epoch
+                if read_cache is not None and read_cache_epoch is None
+                else read_cache_epoch
+            ),
+            validated_params=validated_params,
          )
         try:
             result = await tool.execute(invocation)
@@ -68,6 +141,22 @@ class ToolRegistry:
             )
         return result
 
+    def _validate(
+        self,
+        tool:Tool,
+        parameters:dict[str,Any],
+    )->tuple[BaseModel|None,list[str]]:
+        # Validate once; the model instance goes to the tool on the invocation
+        validator = self._validators.get(tool.name)
+        if validator is None:
+            return None, tool.validate_params(parameters)
+        try:
+            return validator.validate_python(parameters), []
+        except ValidationError as e:
+            return None, format_validation_errors(e)
+        except Exception as e:
+            return None, [str(e)]
+
 def create_default_registry()->ToolRegistry:
     registry = ToolRegistry()
     
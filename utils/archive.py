@@ -0,0 +1,143 @@
+import struct
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from utils.paths import FileProbe
+
+MAX_CACHED_INDEXES = 32
+
+_ZIP_LOCAL_HEADER = struct.Struct(zipfile.structFileHeader)
+
+
+@dataclass
+class ArchiveMember:
+    name: str
+    size: int
+    is_dir: bool = False
+    # tar: offset of the data in the (decompressed) archive stream
+    data_offset: int = 0
+    # zip: the central directory entry, enough to open the member directly
+    zip_info: zipfile.ZipInfo | None = None
+
+
+@dataclass
+class ArchiveIndex:
+    # "zip" or "tar"
+    kind: str
+    members: dict[str, ArchiveMember] = field(default_factory=dict)
+
+    def find(self, name: str) -> ArchiveMember | None:
+        member = self.members.get(name)
+        if member is None:
+            # Tarballs often store "./name"; accept either spelling
+            member = self.members.get(f"./{name}") or self.members.get(name.removeprefix("./"))
+        return member
+
+
+def _index_zip(stream: BinaryIO) -> ArchiveIndex:
+    index = ArchiveIndex(kind="zip")
+    with zipfile.ZipFile(stream) as archive:
+        for info in archive.infolist():
+            index.members[info.filename] = ArchiveMember(
+                name=info.filename,
+                size=info.file_size,
+                is_dir=info.is_dir(),
+                zip_info=info,
+            )
+    return index
+
+
+def _index_tar(stream: BinaryIO) -> ArchiveIndex:
+    index = ArchiveIndex(kind="tar")
+    # "r|" reads headers strictly forward, so a compressed tarball is
+    # decompressed once, in bounded memory, and never seeked backwards
+    with tarfile.open(fileobj=stream, mode="r|") as archive:
+        for info in archive:
+            index.members[info.name] = ArchiveMember(
+                name=info.name,
+                size=info.size,
+                is_dir=info.isdir(),
+                data_offset=info.offset_data,
+            )
+    return index
+
+
+def build_archive_index(probe: FileProbe) -> ArchiveIndex | None:
+    """Member index of a zip or (possibly compressed) tar; None if neither."""
+    if probe.compression is None:
+        with probe.open() as f:
+            if zipfile.is_zipfile(f):
+                return _index_zip(f)
+
+    with probe.open_content() as f:
+        try:
+            return _index_tar(f)
+        except tarfile.TarError:
+            return None
+
+
+_index_cache: OrderedDict[tuple[str, int, int], ArchiveIndex | None] = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def get_archive_index(probe: FileProbe) -> ArchiveIndex | None:
+    """
+    Member index cached per (path, mtime, size): listing again or reading
+    another member never rescans the archive.
+    """
+    key = (str(probe.path), probe.stat.st_mtime_ns, probe.size)
+    with _index_cache_lock:
+        if key in _index_cache:
+            _index_cache.move_to_end(key)
+            return _index_cache[key]
+
+    index = build_archive_index(probe)
+    with _index_cache_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    return index
+
+
+class _BoundedReader:
+    """Read at most `size` bytes from the current position of `stream`."""
+
+    def __init__(self, stream: BinaryIO, size: int) -> None:
+        self._stream = stream
+        self._size = size
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._size - self._pos
+        if size < 0 or size > remaining:
+            size = remaining
+        data = self._stream.read(size)
+        self._pos += len(data)
+        return data
+
+
+def open_member(content: BinaryIO, index: ArchiveIndex, member: ArchiveMember) -> BinaryIO:
+    """
+    Stream of one member's bytes, positioned straight at its data through
+    the index. `content` is the raw file for zip and the decompressed
+    stream (FileProbe.open_content) for tar.
+    """
+    if index.kind == "tar":
+        # A compressed stream emulates this seek by decompressing forward
+        content.seek(member.data_offset)
+        return _BoundedReader(content, member.size)
+
+    info = member.zip_info
+    if info.flag_bits & 0x1:
+        raise ValueError(f"{member.name} is encrypted")
+    content.seek(info.header_offset)
+    header = _ZIP_LOCAL_HEADER.unpack(content.read(_ZIP_LOCAL_HEADER.size))
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"bad local header for {member.name}")
+    # Skip the file name and extra field (the last two header fields)
+    content.seek(header[-2] + header[-1], 1)
+    return zipfile.ZipExtFile(content, "r", info)
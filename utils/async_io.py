@@ -0,0 +1,41 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# File reads are mostly page-cache copies and tokenization releases the GIL,
+# so a few threads keep the loop free without oversubscribing the CPU
+MAX_IO_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+_io_executor: ThreadPoolExecutor | None = None
+_io_executor_lock = threading.Lock()
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=MAX_IO_WORKERS,
+                    thread_name_prefix="tool-io",
+                )
+    return _io_executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call (stat/open/read/tokenize) on the shared I/O pool so
+    the event loop keeps streaming while it works. Context variables are
+    carried over, as with asyncio.to_thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_io_executor(), call)
@@ -0,0 +1,472 @@
+import io
+import mmap
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+from utils.line_index import get_line_index_cache, skip_lines
+from utils.text import count_tokens_batch
+
+STREAM_CHUNK_SIZE = 256 * 1024
+# Blocks read backwards from EOF when tailing
+TAIL_BLOCK_SIZE = 64 * 1024
+# A line still unterminated after this many bytes is cut, so one pathological
+# line cannot exhaust memory
+MAX_LINE_BYTES = 1024 * 1024
+
+
+@dataclass
+class LineRange:
+    # 1-based number of the first returned line
+    start_line: int
+    # None when a streaming read stopped before reaching the end of the file
+    total_lines: int | None
+    lines: list[str] = field(default_factory=list)
+    # Stopped early because the token budget was filled
+    truncated: bool = False
+
+    @property
+    def end_line(self) -> int:
+        return self.start_line + len(self.lines) - 1
+
+
+@dataclass
+class TailRange:
+    lines: list[str] = field(default_factory=list)
+    # Byte span of the returned lines: [start_offset, end_offset)
+    start_offset: int = 0
+    end_offset: int = 0
+    # Stopped by the line limit or token budget before the other end of the file
+    truncated: bool = False
+    # Where following the file should resume: just past the last complete line
+    resume_offset: int = 0
+
+
+def decode_text(data: bytes, encoding: str = "utf-8") -> str:
+    try:
+        return data.decode(encoding)
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def split_lines(text: str) -> list[str]:
+    # Split on "\n" only so numbering matches the byte scan; drop "\r" of CRLF
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+def read_line_range(
+    path: str | Path,
+    offset: int = 1,
+    limit: int | None = None,
+    encoding: str = "utf-8",
+    stream: BinaryIO | None = None,
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+    line_overhead_tokens: int = 0,
+) -> LineRange:
+    """
+    Read lines [offset, offset + limit) of a file through a memory map.
+
+    Only the requested byte slice is copied and decoded. Line positions come
+    from the cached line index, so after the first scan of a file version
+    seeking to any line is O(1). With `max_tokens` the window is decoded
+    block by block and reading stops once the budget is filled, as in
+    read_stream_lines. Pass `stream` to map an already open file instead of
+    opening `path` again.
+    """
+    if stream is None:
+        with open(path, "rb") as f:
+            return read_line_range(
+                path,
+                offset,
+                limit,
+                encoding,
+                stream=f,
+                max_tokens=max_tokens,
+                model=model,
+                line_overhead_tokens=line_overhead_tokens,
+            )
+
+    stat = os.fstat(stream.fileno())
+    if stat.st_size == 0:
+        return LineRange(start_line=offset, total_lines=0)
+
+    with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        index = get_line_index_cache().get(path, buffer, stat)
+        start = index.line_start(buffer, offset)
+        end = len(buffer) if limit is None else skip_lines(buffer, start, limit)
+        result = LineRange(start_line=offset, total_lines=index.total_lines)
+
+        if max_tokens is None:
+            result.lines = split_lines(decode_text(buffer[start:end], encoding))
+            return result
+
+        tokens = 0
+        pos = start
+        while pos < end:
+            block_end = min(pos + STREAM_CHUNK_SIZE, end)
+            if block_end < end:
+                # Cut blocks at a line boundary; an overlong line is one block
+                newline = buffer.rfind(b"\n", pos, block_end)
+                block_end = newline + 1 if newline >= 0 else min(skip_lines(buffer, pos, 1), end)
+
+            selected = split_lines(decode_text(buffer[pos:block_end], encoding))
+            for line_index, line_tokens in enumerate(count_tokens_batch(selected, model)):
+                tokens += line_tokens + line_overhead_tokens
+                if tokens > max_tokens:
+                    result.lines.extend(selected[:line_index])
+                    result.truncated = True
+                    return result
+            result.lines.extend(selected)
+            pos = block_end
+        return result
+
+
+class Utf8Reader:
+    """
+    Binary stream view of a file in a wide encoding (UTF-16/32), re-encoded
+    as UTF-8 so the newline byte scans work on it.
+    """
+
+    def __init__(self, stream: BinaryIO, encoding: str) -> None:
+        # newline="" keeps "\r\n" as-is, exactly like the byte readers see it
+        self._text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+
+    def read(self, size: int = -1) -> bytes:
+        return self._text.read(size).encode("utf-8")
+
+
+class PrefixedStream:
+    """`stream` with `prefix` (e.g. a sniffed head) put back in front of it."""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO) -> None:
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._prefix:
+            return self._stream.read(size)
+        if size < 0:
+            data, self._prefix = self._prefix + self._stream.read(), b""
+            return data
+        data, self._prefix = self._prefix[:size], self._prefix[size:]
+        return data
+
+
+def iter_line_spans(
+    stream: BinaryIO,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[tuple[bytes, int]]:
+    """
+    Yield (block, dropped): blocks of whole lines read `chunk_size` bytes at
+    a time. Every block but the last ends with a newline; memory stays
+    bounded by the chunk size and MAX_LINE_BYTES. A line longer than that
+    is cut, and only a block's first line can be a cut one: `dropped` is
+    how many of its bytes were skipped, so the block spans
+    len(block) + dropped bytes of the stream.
+    """
+    carry = b""
+    skipping = False
+    dropped = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        if skipping:
+            # Discard the rest of an overlong line
+            cut = chunk.find(b"\n")
+            if cut == -1:
+                dropped += len(chunk)
+                continue
+            dropped += cut
+            chunk = chunk[cut:]
+            skipping = False
+
+        data = carry + chunk if carry else chunk
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            carry = data
+        else:
+            carry = data[cut + 1:]
+            yield data[:cut + 1], dropped
+            dropped = 0
+
+        if len(carry) > MAX_LINE_BYTES:
+            dropped += len(carry) - MAX_LINE_BYTES
+            carry = carry[:MAX_LINE_BYTES]
+            skipping = True
+
+    if carry:
+        yield carry, dropped
+
+
+def iter_line_blocks(
+    stream: BinaryIO,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Blocks of whole lines, as iter_line_spans without the byte accounting."""
+    for block, _ in iter_line_spans(stream, chunk_size):
+        yield block
+
+
+def read_stream_lines(
+    stream: BinaryIO,
+    offset: int = 1,
+    limit: int | None = None,
+    encoding: str = "utf-8",
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+    line_overhead_tokens: int = 0,
+) -> LineRange:
+    """
+    Read a line window from a byte stream, stopping as soon as `limit`
+    lines or `max_tokens` (plus `line_overhead_tokens` per line, e.g. for
+    line numbers) are reached. Lines before `offset` are only counted.
+    """
+    result = LineRange(start_line=offset, total_lines=None)
+    tokens = 0
+    consumed = 0
+
+    for block in iter_line_blocks(stream):
+        newlines = block.count(b"\n")
+        block_lines = newlines + (0 if block.endswith(b"\n") else 1)
+        if consumed + block_lines < offset:
+            consumed += block_lines
+            continue
+
+        selected = split_lines(decode_text(block, encoding))[max(0, offset - 1 - consumed):]
+        consumed += block_lines
+        if limit is not None:
+            selected = selected[:limit - len(result.lines)]
+
+        if max_tokens is not None:
+            counts = count_tokens_batch(selected, model)
+            for index, line_tokens in enumerate(counts):
+                tokens += line_tokens + line_overhead_tokens
+                if tokens > max_tokens:
+                    result.lines.extend(selected[:index])
+                    result.truncated = True
+                    return result
+
+        result.lines.extend(selected)
+        if limit is not None and len(result.lines) >= limit:
+            return result
+
+    result.total_lines = consumed
+    return result
+
+
+def stream_line_range(
+    path: str | Path,
+    offset: int = 1,
+    limit: int | None = None,
+    encoding: str = "utf-8",
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+    line_overhead_tokens: int = 0,
+    stream: BinaryIO | None = None,
+) -> LineRange:
+    if stream is None:
+        with open(path, "rb") as f:
+            return stream_line_range(
+                path,
+                offset,
+                limit,
+                encoding,
+                max_tokens=max_tokens,
+                model=model,
+                line_overhead_tokens=line_overhead_tokens,
+                stream=f,
+            )
+
+    if encoding in ("utf-16", "utf-32"):
+        stream = Utf8Reader(stream, encoding)
+        encoding = "utf-8"
+    return read_stream_lines(
+        stream,
+        offset,
+        limit,
+        encoding,
+        max_tokens=max_tokens,
+        model=model,
+        line_overhead_tokens=line_overhead_tokens,
+    )
+
+
+def _take_lines(
+    raw_lines: list[bytes],
+    count: int,
+    encoding: str,
+    max_tokens: int | None,
+    model: str,
+    line_overhead_tokens: int,
+    tokens: int,
+) -> tuple[list[str], int, bool]:
+    """
+    Decode and keep lines of `raw_lines` in order until `count` lines or the
+    token budget is reached. Returns (lines, tokens so far, stopped early).
+    """
+    lines = [decode_text(raw[:-1] if raw.endswith(b"\r") else raw, encoding) for raw in raw_lines[:count]]
+    stopped = len(raw_lines) > count
+    if max_tokens is not None:
+        for index, line_tokens in enumerate(count_tokens_batch(lines, model)):
+            tokens += line_tokens + line_overhead_tokens
+            if tokens > max_tokens:
+                return lines[:index], tokens, True
+    return lines, tokens, stopped
+
+
+def _line_start_before(stream: BinaryIO, pos: int, block_size: int = TAIL_BLOCK_SIZE) -> int:
+    """Offset just past the last newline before `pos` (0 if there is none)."""
+    while pos > 0:
+        start = max(0, pos - block_size)
+        stream.seek(start)
+        cut = stream.read(pos - start).rfind(b"\n")
+        if cut != -1:
+            return start + cut + 1
+        pos = start
+    return 0
+
+
+def read_tail(
+    stream: BinaryIO,
+    size: int,
+    count: int,
+    encoding: str = "utf-8",
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+    line_overhead_tokens: int = 0,
+    block_size: int = TAIL_BLOCK_SIZE,
+) -> TailRange:
+    """
+    Last `count` lines of a seekable stream of `size` bytes, read backwards
+    from EOF block by block until the lines or `max_tokens` are filled. Cost
+    is proportional to the output, not to the file.
+    """
+    result = TailRange(start_offset=size, end_offset=size, resume_offset=size)
+    pos = size
+    carry = b""
+    collected: list[str] = []
+    tokens = 0
+    # The newline ending the last line does not start another one
+    trailing = True
+    # Inside an overlong line whose end was already returned
+    skipping = False
+    # The file does not end with a newline, so its last line may be incomplete
+    partial = False
+
+    while pos > 0 and len(collected) < count:
+        start = max(0, pos - block_size)
+        stream.seek(start)
+        data = stream.read(pos - start) + carry
+        pos = start
+        carry = b""
+        if trailing:
+            partial = not data.endswith(b"\n")
+            if not partial:
+                data = data[:-1]
+            trailing = False
+
+        if skipping:
+            end = data.rfind(b"\n")
+            if end == -1:
+                continue
+            data = data[:end]
+            skipping = False
+
+        if pos > 0:
+            cut = data.find(b"\n")
+            if cut == -1:
+                if len(data) <= MAX_LINE_BYTES:
+                    # No line start in this block yet
+                    carry = data
+                    continue
+                # Overlong line: return its last MAX_LINE_BYTES and skip the rest
+                raw_lines = [data[-MAX_LINE_BYTES:]]
+                line_start = pos + len(data) - MAX_LINE_BYTES
+                skipping = True
+            else:
+                carry = data[:cut]
+                raw_lines = data[cut + 1:].split(b"\n")
+                line_start = pos + cut + 1
+        else:
+            raw_lines = data.split(b"\n")
+            line_start = 0
+
+        if partial:
+            # The last line is still being written; a follower should reread it
+            if skipping:
+                # It is overlong and was cut: find where it really starts
+                result.resume_offset = _line_start_before(stream, line_start, block_size)
+            else:
+                result.resume_offset = line_start + sum(len(raw) + 1 for raw in raw_lines[:-1])
+            partial = False
+
+        # Newest first, so the budget is spent on the end of the file
+        raw_lines.reverse()
+        lines, tokens, stopped = _take_lines(
+            raw_lines,
+            count - len(collected),
+            encoding,
+            max_tokens,
+            model,
+            line_overhead_tokens,
+            tokens,
+        )
+        collected.extend(lines)
+        result.start_offset = line_start + sum(len(raw) + 1 for raw in raw_lines[len(lines):])
+        if stopped:
+            result.truncated = True
+            break
+
+    if len(collected) >= count and (pos > 0 or carry):
+        result.truncated = True
+    result.lines = collected[::-1]
+    return result
+
+
+def read_since(
+    stream: BinaryIO,
+    offset: int,
+    count: int,
+    encoding: str = "utf-8",
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+    line_overhead_tokens: int = 0,
+) -> TailRange:
+    """
+    Complete lines appended after byte `offset` (follow mode). A trailing
+    line still being written is left for the next call: `end_offset` is
+    where that call should resume.
+    """
+    stream.seek(offset)
+    result = TailRange(start_offset=offset, end_offset=offset, resume_offset=offset)
+    tokens = 0
+    for block, dropped in iter_line_spans(stream):
+        if not block.endswith(b"\n"):
+            break
+        raw_lines = block[:-1].split(b"\n")
+        lines, tokens, stopped = _take_lines(
+            raw_lines,
+            count - len(result.lines),
+            encoding,
+            max_tokens,
+            model,
+            line_overhead_tokens,
+            tokens,
+        )
+        result.lines.extend(lines)
+        # Advance by the bytes consumed, including any skipped from a cut line
+        if lines:
+            result.end_offset += dropped + sum(len(raw) + 1 for raw in raw_lines[:len(lines)])
+        result.resume_offset = result.end_offset
+        if stopped:
+            result.truncated = True
+            break
+    return result
@@ -0,0 +1,75 @@
+from collections.abc import Sequence
+from enum import Enum
+
+# Compact output repeats the line number at least this often
+ANCHOR_INTERVAL = 20
+# Shorter indentation is left as spaces. This counts characters, not
+# tokens: a run of spaces is often a single token, so "~8|" can cost as
+# much as the indentation it replaces. Folding is therefore opt-in until
+# benchmarks/measure_read_format.py shows a saving with the real encodings.
+FOLD_MIN_INDENT = 4
+
+COMPACT_LEGEND = "Compact format: 'N|' is line N and each following '|' is the next line."
+# Legend for output produced with format_compact(fold=True)
+FOLDED_LEGEND = COMPACT_LEGEND + " '~K|' at the start of a line stands for K leading spaces."
+
+
+class LineFormat(str, Enum):
+    # "{n:6}|line" on every line
+    NUMBERED = "numbered"
+    # Sparse line numbers (optionally folded indentation), see COMPACT_LEGEND
+    COMPACT = "compact"
+
+
+def format_numbered(lines: Sequence[str], first_line: int = 1) -> list[str]:
+    return [f"{i:6}|{line}" for i, line in enumerate(lines, start=first_line)]
+
+
+def fold_indent(line: str) -> str:
+    stripped = line.lstrip(" ")
+    indent = len(line) - len(stripped)
+    if indent >= FOLD_MIN_INDENT:
+        # "|" ends the count, so text starting with a digit stays unambiguous
+        return f"~{indent}|{stripped}"
+    if not indent and line.startswith("~"):
+        # Escape a literal leading "~" so it cannot be read as folded indentation
+        return f"~0|{line}"
+    return line
+
+
+def format_compact(
+    lines: Sequence[str],
+    first_line: int = 1,
+    anchor_interval: int = ANCHOR_INTERVAL,
+    fold: bool = False,
+) -> list[str]:
+    """
+    Number only anchor lines: the first one, every `anchor_interval` lines,
+    and top-level lines that start a block after a blank line. Every other
+    line is "|text", one more than the line before, so exact line numbers
+    stay recoverable for edits.
+    """
+    result = []
+    last_anchor = None
+    previous_blank = False
+    for i, line in enumerate(lines, start=first_line):
+        blank = not line.strip()
+        block_start = previous_blank and not blank and not line[:1].isspace()
+        if last_anchor is None or i - last_anchor >= anchor_interval or block_start:
+            prefix = f"{i}|"
+            last_anchor = i
+        else:
+            prefix = "|"
+        result.append(prefix + (fold_indent(line) if fold else line))
+        previous_blank = blank
+    return result
+
+
+def format_lines(
+    lines: Sequence[str],
+    first_line: int = 1,
+    line_format: LineFormat = LineFormat.NUMBERED,
+) -> list[str]:
+    if line_format == LineFormat.COMPACT:
+        return format_compact(lines, first_line)
+    return format_numbered(lines, first_line)
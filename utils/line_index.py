@@ -0,0 +1,285 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+from utils.paths import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Newlines are located by counting whole chunks at C speed; only the chunk
+# holding the wanted line is searched newline by newline.
+CHUNK_SIZE = 1024 * 1024
+
+# Blocks small enough that finding a checkpoint inside one is cheap
+SCAN_BLOCK_SIZE = 8 * 1024
+
+# One checkpoint every N lines: line N is at most INDEX_STRIDE - 1 finds away
+INDEX_STRIDE = 256
+MAX_CACHED_INDEXES = 64
+# Smaller files rescan faster than a sidecar can be read back
+MIN_PERSISTED_SIZE = 8 * 1024 * 1024
+# Bytes before the indexed end that must be unchanged for an append to be trusted
+TAIL_CHECK_SIZE = 64
+
+_HEADER = struct.Struct("<8sQQQqIQ?H")
+_MAGIC = b"ANCLIDX1"
+
+
+def count_lines(buffer: mmap.mmap | bytes, start: int = 0) -> int:
+    size = len(buffer)
+    newlines = 0
+    for pos in range(start, size, CHUNK_SIZE):
+        newlines += buffer[pos:pos + CHUNK_SIZE].count(b"\n")
+
+    # A final line without a trailing newline still counts
+    if size > start and buffer[size - 1:size] != b"\n":
+        newlines += 1
+    return newlines
+
+
+def skip_lines(buffer: mmap.mmap | bytes, start: int, count: int) -> int:
+    """Byte offset just past `count` newlines from `start` (or EOF)."""
+    size = len(buffer)
+    pos = start
+    while count > 0 and pos < size:
+        chunk = buffer[pos:pos + CHUNK_SIZE]
+        newlines = chunk.count(b"\n")
+        if newlines < count:
+            count -= newlines
+            pos += len(chunk)
+            continue
+
+        index = -1
+        for _ in range(count):
+            index = chunk.find(b"\n", index + 1)
+        return pos + index + 1
+    return min(pos, size)
+
+
+@dataclass
+class LineIndex:
+    """
+    Sparse newline index of one file version.
+
+    `checkpoints[i]` is the byte offset where line i * stride + 1 starts, so
+    seeking to any line is one array lookup plus fewer than `stride` finds.
+    """
+    device: int
+    inode: int
+    size: int
+    mtime_ns: int
+    stride: int = INDEX_STRIDE
+    newlines: int = 0
+    ends_with_newline: bool = True
+    tail: bytes = b""
+    checkpoints: array = field(default_factory=lambda: array("Q", [0]))
+
+    @property
+    def total_lines(self) -> int:
+        if self.size == 0:
+            return 0
+        return self.newlines + (0 if self.ends_with_newline else 1)
+
+    def line_start(self, buffer: mmap.mmap | bytes, line: int) -> int:
+        skipped = line - 1
+        checkpoint = min(skipped // self.stride, len(self.checkpoints) - 1)
+        pos = self.checkpoints[checkpoint]
+        return skip_lines(buffer, pos, skipped - checkpoint * self.stride)
+
+    def copy(self) -> "LineIndex":
+        return replace(self, checkpoints=array("Q", self.checkpoints))
+
+    def extend(self, buffer: mmap.mmap | bytes, stat: os.stat_result) -> None:
+        """Index bytes appended since the last scan."""
+        pos = self.size
+        end = stat.st_size
+        # Newlines still to pass before the next checkpoint line starts
+        remaining = self.stride - self.newlines % self.stride
+        while pos < end:
+            block = buffer[pos:min(pos + SCAN_BLOCK_SIZE, end)]
+            newlines = block.count(b"\n")
+            if newlines < remaining:
+                remaining -= newlines
+                self.newlines += newlines
+                pos += len(block)
+                continue
+
+            index = -1
+            for _ in range(remaining):
+                index = block.find(b"\n", index + 1)
+            self.newlines += remaining
+            pos += index + 1
+            self.checkpoints.append(pos)
+            remaining = self.stride
+
+        if end:
+            self.ends_with_newline = buffer[end - 1:end] == b"\n"
+        self.tail = bytes(buffer[max(0, end - TAIL_CHECK_SIZE):end])
+        self.size = end
+        self.mtime_ns = stat.st_mtime_ns
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return (
+            self.inode == stat.st_ino
+            and self.device == stat.st_dev
+            and self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+        )
+
+    def is_appended(self, buffer: mmap.mmap | bytes, stat: os.stat_result) -> bool:
+        return (
+            self.inode == stat.st_ino
+            and self.device == stat.st_dev
+            and stat.st_size > self.size
+            and buffer[max(0, self.size - TAIL_CHECK_SIZE):self.size] == self.tail
+        )
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            _MAGIC,
+            self.device,
+            self.inode,
+            self.size,
+            self.mtime_ns,
+            self.stride,
+            self.newlines,
+            self.ends_with_newline,
+            len(self.tail),
+        )
+        return header + self.tail + self.checkpoints.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LineIndex | None":
+        if len(data) < _HEADER.size:
+            return None
+        magic, device, inode, size, mtime_ns, stride, newlines, ends_with_newline, tail_size = (
+            _HEADER.unpack_from(data)
+        )
+        if magic != _MAGIC:
+            return None
+        body = _HEADER.size + tail_size
+        # A truncated or corrupt sidecar is treated as missing
+        if stride <= 0 or len(data) <= body or (len(data) - body) % array("Q").itemsize:
+            return None
+        checkpoints = array("Q")
+        checkpoints.frombytes(data[body:])
+        return cls(
+            device=device,
+            inode=inode,
+            size=size,
+            mtime_ns=mtime_ns,
+            stride=stride,
+            newlines=newlines,
+            ends_with_newline=ends_with_newline,
+            tail=data[_HEADER.size:body],
+            checkpoints=checkpoints,
+        )
+
+
+class LineIndexCache:
+    """
+    LRU of line indexes keyed by path and validated against
+    (device, inode, size, mtime). Appends to a file extend a copy of its
+    index, never the shared one.
+    With `persist_dir`, indexes of large files are also kept as sidecar
+    files so a new process skips the first scan.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_CACHED_INDEXES,
+        persist_dir: str | Path | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self._entries: OrderedDict[str, LineIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str | Path, buffer: mmap.mmap | bytes, stat: os.stat_result) -> LineIndex:
+        key = str(path)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+
+        if index is None and self.persist_dir and stat.st_size >= MIN_PERSISTED_SIZE:
+            index = self._load(key)
+
+        changed = True
+        if index is not None and index.is_current(stat):
+            changed = False
+        elif index is not None and index.is_appended(buffer, stat):
+            # Other threads may be reading (or extending) the cached index:
+            # extend a private copy and swap it in under the lock below
+            index = index.copy()
+            index.extend(buffer, stat)
+        else:
+            index = LineIndex(
+                device=stat.st_dev,
+                inode=stat.st_ino,
+                size=0,
+                mtime_ns=stat.st_mtime_ns,
+            )
+            index.extend(buffer, stat)
+
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        if changed and self.persist_dir and stat.st_size >= MIN_PERSISTED_SIZE:
+            self._store(key, index)
+        return index
+
+    def invalidate(self, path: str | Path) -> None:
+        with self._lock:
+            self._entries.pop(str(path), None)
+
+    def _sidecar(self, key: str) -> Path:
+        name = hashlib.blake2b(key.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+        return self.persist_dir / f"{name}.idx"
+
+    def _load(self, key: str) -> LineIndex | None:
+        try:
+            return LineIndex.from_bytes(self._sidecar(key).read_bytes())
+        except (OSError, struct.error, ValueError):
+            return None
+
+    def _store(self, key: str, index: LineIndex) -> None:
+        # Write-then-rename so a concurrent reader never sees a partial sidecar
+        try:
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.persist_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(index.to_bytes())
+            os.replace(tmp, self._sidecar(key))
+        except OSError as e:
+            logger.debug(f"failed to persist line index for {key}: {e}")
+
+
+_line_index_cache: LineIndexCache | None = None
+_line_index_cache_lock = threading.Lock()
+
+
+def get_line_index_cache() -> LineIndexCache:
+    global _line_index_cache
+    if _line_index_cache is None:
+        with _line_index_cache_lock:
+            if _line_index_cache is None:
+                persist_dir = None
+                if os.getenv("ANCIENT_LINE_INDEX_CACHE", "1") != "0":
+                    try:
+                        persist_dir = get_cache_dir("line_index")
+                    except OSError as e:
+                        logger.warning(f"Line index sidecars disabled: {e}")
+                _line_index_cache = LineIndexCache(persist_dir=persist_dir)
+    return _line_index_cache
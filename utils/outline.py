@@ -0,0 +1,137 @@
+import ast
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+MAX_CACHED_OUTLINES = 128
+# Width of the "start-end" column
+RANGE_WIDTH = 11
+
+
+@dataclass
+class OutlineEntry:
+    start_line: int
+    end_line: int
+    depth: int
+    signature: str
+    # First line of the docstring, if any
+    doc: str = ""
+
+
+def _first_doc_line(node: ast.AST) -> str:
+    doc = ast.get_docstring(node, clean=True)
+    return doc.strip().splitlines()[0] if doc and doc.strip() else ""
+
+
+def _start_line(node: ast.AST) -> int:
+    # Decorators belong to the definition they decorate
+    decorators = getattr(node, "decorator_list", None) or []
+    return min([node.lineno, *(d.lineno for d in decorators)])
+
+
+def _decorators(node: ast.AST) -> str:
+    return "".join(f"@{ast.unparse(d)} " for d in node.decorator_list)
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases]
+        bases += [ast.unparse(k) for k in node.keywords]
+        return f"{_decorators(node)}class {node.name}" + (f"({', '.join(bases)})" if bases else "")
+
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{_decorators(node)}{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _assignment(node: ast.AST) -> str | None:
+    # Module constants and class fields: "NAME = ...", "name: type"
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        value = " = ..." if node.value is not None else ""
+        return f"{node.target.id}: {ast.unparse(node.annotation)}{value}"
+    if isinstance(node, ast.Assign):
+        names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        if names:
+            return " = ".join(names) + " = ..."
+    return None
+
+
+def _walk(body: list[ast.stmt], depth: int, in_function: bool, entries: list[OutlineEntry]) -> None:
+    for node in body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            entries.append(
+                OutlineEntry(
+                    start_line=_start_line(node),
+                    end_line=node.end_lineno,
+                    depth=depth,
+                    signature=_signature(node),
+                    doc=_first_doc_line(node),
+                )
+            )
+            _walk(node.body, depth + 1, not isinstance(node, ast.ClassDef), entries)
+            continue
+
+        # Names at module or class level only; locals inside functions are noise
+        assignment = None if in_function else _assignment(node)
+        if assignment is not None:
+            entries.append(
+                OutlineEntry(
+                    start_line=node.lineno,
+                    end_line=node.end_lineno,
+                    depth=depth,
+                    signature=assignment,
+                )
+            )
+
+
+def python_outline(source: str) -> list[OutlineEntry]:
+    """
+    Classes, functions (with signatures), module constants and class fields
+    of a Python module, with their line ranges. Raises SyntaxError.
+    """
+    tree = ast.parse(source)
+    entries: list[OutlineEntry] = []
+    doc = _first_doc_line(tree)
+    if doc:
+        first = tree.body[0]
+        entries.append(OutlineEntry(first.lineno, first.end_lineno, 0, f'"""{doc}"""'))
+    _walk(tree.body, 0, False, entries)
+    return entries
+
+
+def format_outline(entries: list[OutlineEntry]) -> str:
+    lines = []
+    for entry in entries:
+        span = (
+            f"{entry.start_line}-{entry.end_line}"
+            if entry.end_line != entry.start_line
+            else f"{entry.start_line}"
+        )
+        doc = f"  # {entry.doc}" if entry.doc else ""
+        lines.append(f"{span:<{RANGE_WIDTH}}{'    ' * entry.depth}{entry.signature}{doc}")
+    return "\n".join(lines)
+
+
+_outline_cache: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+_outline_cache_lock = threading.Lock()
+
+
+def get_outline(path: str, mtime_ns: int, size: int, read_source: Callable[[], str]) -> str:
+    """
+    Formatted outline of a Python file, cached per (path, mtime, size):
+    exploring the same module again neither rereads nor reparses it.
+    """
+    key = (path, mtime_ns, size)
+    with _outline_cache_lock:
+        outline = _outline_cache.get(key)
+        if outline is not None:
+            _outline_cache.move_to_end(key)
+            return outline
+
+    outline = format_outline(python_outline(read_source()))
+    with _outline_cache_lock:
+        _outline_cache[key] = outline
+        while len(_outline_cache) > MAX_CACHED_OUTLINES:
+            _outline_cache.popitem(last=False)
+    return outline
@@ -1,4 +1,16 @@
+import bz2
+import codecs
+import gzip
+import lzma
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
+from stat import S_ISDIR, S_ISREG
+from typing import BinaryIO
 
 
 def resolve_path(base:str|Path,path:str|Path):
@@ -10,9 +22,206 @@ def resolve_path(base:str|Path,path:str|Path):
 
 def is_binary_file(path:str|Path)->bool:
     try:
-        with open(path,"rb") as f:
-            chunk = f.read(8192)
-            return b"\x00" in chunk
+        with probe_file(path) as probe:
+            return probe.is_binary
     except (OSError,IOError):
         return False
+
+
+def get_cache_dir(name:str|None=None)->Path:
+    # ANCIENT_CACHE_DIR overrides the XDG/home default
+    base = os.getenv("ANCIENT_CACHE_DIR")
+    if base:
+        root = Path(base)
+    else:
+        root = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache") / "ancient"
     
+    path = root / name if name else root
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# Bytes sniffed from the head of a file for binary/encoding detection
+SNIFF_SIZE = 8192
+MAX_CACHED_PROBES = 256
+
+# Longest BOM first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+# Compressed formats read transparently, by magic number. "BZh" alone is
+# common in text, so bz2 also needs the block size digit and the magic of
+# the first block (or of the end of an empty stream)
+_COMPRESSION_MAGIC = (
+    (re.compile(rb"\x1f\x8b"), "gzip"),
+    (re.compile(rb"BZh[1-9](?:\x31\x41\x59\x26\x53\x59|\x17\x72\x45\x38\x50\x90)"), "bz2"),
+    (re.compile(rb"\xfd7zXZ\x00"), "xz"),
+)
+
+# What the stdlib decompressors raise on a corrupt or truncated stream;
+# gzip surfaces bad deflate data as a bare zlib.error
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError)
+
+
+def open_decompressed(stream: BinaryIO, compression: str) -> BinaryIO:
+    """Stream-decompressing view of `stream`; nothing is written to disk."""
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(stream, mode="rb")
+    if compression == "xz":
+        return lzma.LZMAFile(stream, mode="rb")
+    raise ValueError(f"unsupported compression: {compression}")
+
+
+@dataclass
+class FileProbe:
+    """
+    Everything a reader needs to know about a path, from one open, one
+    fstat and one head read. Holds the open descriptor until closed.
+
+    For a compressed file, `is_binary` and `encoding` describe the
+    decompressed content and `size` is still the size on disk.
+    """
+    path: Path
+    exists: bool
+    is_file: bool = False
+    is_dir: bool = False
+    size: int = 0
+    is_binary: bool = False
+    encoding: str = "utf-8"
+    bom_size: int = 0
+    # "gzip", "bz2" or "xz" when the content is compressed
+    compression: str | None = None
+    fd: int | None = None
+    stat: os.stat_result | None = None
+
+    def open(self) -> BinaryIO:
+        # Shares the probed descriptor; closing the returned file leaves it open
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return os.fdopen(self.fd, "rb", closefd=False)
+
+    def open_content(self) -> BinaryIO:
+        # Like open(), but decompressing; not seekable cheaply when compressed
+        stream = self.open()
+        if self.compression is None:
+            return stream
+        return open_decompressed(stream, self.compression)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self) -> "FileProbe":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+_probe_cache: OrderedDict[tuple[int, int, int, int], tuple[bool, str, int, str | None]] = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+
+def _sniff_fd(fd: int) -> tuple[bool, str, int, str | None]:
+    head = os.read(fd, SNIFF_SIZE)
+    for magic, compression in _COMPRESSION_MAGIC:
+        if magic.match(head):
+            break
+    else:
+        return (*sniff_text(head), None)
+
+    # Judge the decompressed text, not the compressed bytes
+    os.lseek(fd, 0, os.SEEK_SET)
+    try:
+        with os.fdopen(fd, "rb", closefd=False) as raw:
+            with open_decompressed(raw, compression) as stream:
+                content = stream.read(SNIFF_SIZE)
+    except DECOMPRESSION_ERRORS:
+        # The magic was a coincidence or the stream is corrupt: judge the
+        # bytes as they are (a damaged archive still sniffs as binary)
+        return (*sniff_text(head), None)
+    return (*sniff_text(content), compression)
+
+
+def sniff_text(head: bytes) -> tuple[bool, str, int]:
+    """(is_binary, encoding guess, BOM length) of the first bytes of a file."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return False, encoding, len(bom)
+
+    if b"\x00" in head:
+        return True, "utf-8", 0
+
+    try:
+        # final=False: a multi-byte character cut at SNIFF_SIZE is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return False, "utf-8", 0
+    except UnicodeDecodeError:
+        return False, "latin-1", 0
+
+
+def probe_file(path: str | Path) -> FileProbe:
+    """
+    Open `path` once and describe it. For a regular file the returned probe
+    owns an open descriptor (use it as a context manager). Sniff results are
+    cached per (device, inode, size, mtime), so re-reading an unchanged file
+    skips the head read.
+    """
+    path = Path(path)
+    # Non-blocking so opening a FIFO (or a device) cannot hang; it is
+    # rejected below once fstat shows it is not a regular file
+    nonblock = getattr(os, "O_NONBLOCK", 0)
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0) | nonblock)
+    except FileNotFoundError:
+        return FileProbe(path=path, exists=False)
+    except IsADirectoryError:
+        # Windows refuses to open directories
+        return FileProbe(path=path, exists=True, is_dir=True)
+
+    try:
+        stat = os.fstat(fd)
+        if not S_ISREG(stat.st_mode):
+            os.close(fd)
+            return FileProbe(path=path, exists=True, is_dir=S_ISDIR(stat.st_mode), stat=stat)
+        if nonblock:
+            os.set_blocking(fd, True)
+
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with _probe_cache_lock:
+            sniffed = _probe_cache.get(key)
+            if sniffed is not None:
+                _probe_cache.move_to_end(key)
+
+        if sniffed is None:
+            sniffed = _sniff_fd(fd)
+            os.lseek(fd, 0, os.SEEK_SET)
+            with _probe_cache_lock:
+                _probe_cache[key] = sniffed
+                while len(_probe_cache) > MAX_CACHED_PROBES:
+                    _probe_cache.popitem(last=False)
+    except BaseException:
+        os.close(fd)
+        raise
+
+    is_binary, encoding, bom_size, compression = sniffed
+    return FileProbe(
+        path=path,
+        exists=True,
+        is_file=True,
+        size=stat.st_size,
+        is_binary=is_binary,
+        encoding=encoding,
+        bom_size=bom_size,
+        compression=compression,
+        fd=fd,
+        stat=stat,
+    )
@@ -1,79 +1,634 @@
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from enum import Enum
+from functools import lru_cache
+from itertools import accumulate
+
 import tiktoken
 
+from utils.token_cache import MIN_CACHED_CHARS, TokenCacheEntry, get_token_cache
 
-def get_tokenizer(model: str):
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENCODING = "cl100k_base"
+MAX_LOADED_ENCODINGS = 4
+
+# Below this many texts the thread-pool hand-off costs more than it saves
+BATCH_MIN_PARALLEL = 64
+BATCH_CHUNK_SIZE = 256
+BATCH_NUM_THREADS = min(8, os.cpu_count() or 1)
+
+
+# Encodings for model families tiktoken does not know about. Keys are matched
+# as prefixes against the bare model name ("qwen3-coder") and against the
+# provider segment of routed ids ("qwen/qwen3-coder:free").
+MODEL_ENCODING_ALIASES: dict[str, str] = {
+    "qwen": "cl100k_base",
+    "deepseek": "cl100k_base",
+    "meta-llama": "cl100k_base",
+    "llama": "cl100k_base",
+    "mistralai": "cl100k_base",
+    "mistral": "cl100k_base",
+    "mixtral": "cl100k_base",
+    "codestral": "cl100k_base",
+    "anthropic": "cl100k_base",
+    "claude": "cl100k_base",
+    "google": "cl100k_base",
+    "gemini": "cl100k_base",
+    "gemma": "cl100k_base",
+    "x-ai": "o200k_base",
+    "grok": "o200k_base",
+}
+
+
+def register_model_alias(prefix: str, encoding_name: str) -> None:
+    MODEL_ENCODING_ALIASES[prefix.lower()] = encoding_name
+    resolve_encoding_name.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def resolve_encoding_name(model: str) -> str:
+    name = model.lower().split(":", 1)[0]
+    provider, _, name = name.rpartition("/")
+
+    try:
+        return tiktoken.encoding_name_for_model(name)
+    except KeyError:
+        pass
+
+    # Longest prefix wins so "mixtral" is not shadowed by a shorter key
+    for prefix in sorted(MODEL_ENCODING_ALIASES, key=len, reverse=True):
+        if name.startswith(prefix) or (provider and provider.startswith(prefix)):
+            return MODEL_ENCODING_ALIASES[prefix]
+
+    return DEFAULT_ENCODING
+
+
+@lru_cache(maxsize=MAX_LOADED_ENCODINGS)
+def _load_encoding(encoding_name: str) -> tiktoken.Encoding | None:
     try:
-        encoding = tiktoken.encoding_for_model(model)
-        return encoding.encode
-    except Exception:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return encoding.encode
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # Cached as None so an offline machine does not retry the download
+        # on every call; callers fall back to estimate_tokens.
+        logger.warning(f"Failed to load tokenizer {encoding_name}: {e}")
+        return None
+
+
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    return _load_encoding(resolve_encoding_name(model))
+
+
+@lru_cache(maxsize=MAX_LOADED_ENCODINGS)
+def _token_byte_lengths(encoding_name: str) -> array:
+    # Byte length of every token id, so offsets need no per-token decode
+    encoding = _load_encoding(encoding_name)
+    lengths = array("I", [0]) * (encoding.max_token_value + 1)
+    for token in range(encoding.max_token_value + 1):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+def get_tokenizer(model: str):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return None
+    # encode_ordinary: file contents may legitimately contain "<|endoftext|>"
+    return encoding.encode_ordinary
+
+
+def utf8_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+def count_tokens(text: str, model: str = "gpt-4", budget: int | None = None) -> int:
+    # Approximate mode: every token covers at least one UTF-8 byte, so a text
+    # of at most `budget` bytes provably fits and gets an estimate instead of
+    # exact tokenization. A chars-per-token guess alone is no such bound:
+    # CJK, base64 or minified data can be off by far more than 2x.
+    if budget is not None:
+        byte_length = utf8_length(text)
+        if byte_length <= budget:
+            return min(estimate_tokens(text, model), byte_length)
+
+    encoding = get_encoding(model)
+
+    if encoding is None:
+        return estimate_tokens(text, model)
+
+    if len(text) >= MIN_CACHED_CHARS:
+        return _count_tokens_cached(text, encoding)
 
+    return len(encoding.encode_ordinary(text))
 
-def count_tokens(text: str, model: str = "gpt-4") -> int:
+
+def _count_tokens_cached(text: str, encoding: tiktoken.Encoding) -> int:
+    cache = get_token_cache()
+    if cache is None:
+        return len(encoding.encode_ordinary(text))
+
+    entry = cache.get(text, encoding.name)
+    if entry is not None:
+        return entry.tokens
+
+    token_count = len(encoding.encode_ordinary(text))
+    cache.put(text, encoding.name, token_count)
+    return token_count
+
+
+_batch_executor: ThreadPoolExecutor | None = None
+_batch_executor_lock = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    # One pool for the process; tiktoken.encode_*_batch spins up a new one per call
+    global _batch_executor
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=BATCH_NUM_THREADS,
+                    thread_name_prefix="tokenizer",
+                )
+    return _batch_executor
+
+
+def count_tokens_batch(texts: Sequence[str], model: str = "gpt-4") -> array:
+    """
+    Count tokens for many strings at once.
+
+    Returns an array('I') aligned with `texts`. Large batches are split into
+    chunks and encoded on a shared thread pool (tiktoken releases the GIL
+    while encoding); only the lengths are kept, never the token lists.
+    """
     tokenizer = get_tokenizer(model)
 
-    if tokenizer:
-        return len(tokenizer(text))
+    if tokenizer is None:
+        return array("I", [estimate_tokens(text, model) for text in texts])
+
+    if len(texts) < BATCH_MIN_PARALLEL or BATCH_NUM_THREADS == 1:
+        return array("I", [len(tokenizer(text)) for text in texts])
+
+    def count_chunk(start: int) -> list[int]:
+        return [len(tokenizer(text)) for text in texts[start:start + BATCH_CHUNK_SIZE]]
+
+    counts = array("I")
+    for chunk in _get_batch_executor().map(count_chunk, range(0, len(texts), BATCH_CHUNK_SIZE)):
+        counts.extend(chunk)
+    return counts
+
+
+class StreamingTokenCounter:
+    """
+    Running token count for text that arrives in deltas.
+
+    Only a short unstable tail is re-tokenized on each feed(); everything
+    before it is committed, since appending text can only re-merge tokens
+    near the end. `total` is live after every delta.
+    """
+
+    TAIL_TOKENS = 16
+
+    def __init__(self, model: str = "gpt-4") -> None:
+        self._model = model
+        self._encoding = get_encoding(model)
+        self._committed = 0
+        self._tail = ""
+        self._tail_tokens = 0
+
+    @property
+    def total(self) -> int:
+        return self._committed + self._tail_tokens
+
+    def feed(self, delta: str) -> int:
+        if not delta:
+            return self.total
+
+        self._tail += delta
+
+        if self._encoding is None:
+            self._tail_tokens = estimate_tokens(self._tail, self._model) if self._tail else 0
+            return self.total
+
+        tokens = self._encoding.encode_ordinary(self._tail)
+        stable = len(tokens) - self.TAIL_TOKENS
+
+        if stable >= self.TAIL_TOKENS:
+            # Step back until the committed prefix ends on a character boundary
+            while stable > 0:
+                try:
+                    prefix = self._encoding.decode_bytes(tokens[:stable]).decode("utf-8")
+                    break
+                except UnicodeDecodeError:
+                    stable -= 1
+            else:
+                prefix = ""
+            self._committed += stable
+            self._tail = self._tail[len(prefix):]
+            tokens = tokens[stable:]
+
+        self._tail_tokens = len(tokens)
+        return self.total
+
+
+class ContentType(str, Enum):
+    CODE = "code"
+    PROSE = "prose"
+    JSON = "json"
+
+
+# Starting chars-per-token ratios, refined per model by TokenEstimator.observe
+DEFAULT_CHARS_PER_TOKEN: dict[ContentType, float] = {
+    ContentType.CODE: 3.2,
+    ContentType.PROSE: 4.2,
+    ContentType.JSON: 2.8,
+}
 
-    return estimate_tokens(text)
+_CODE_CHARS = "{}()[];=<>_"
 
 
-def estimate_tokens(text: str) -> int:
-    return max(1, len(text) // 4)
+def detect_content_type(text: str) -> ContentType:
+    sample = text[:4096]
+    head = sample.lstrip()[:1]
+    if head in ("{", "[") and sample.rstrip()[-1:] in ("}", "]", ","):
+        return ContentType.JSON
+
+    if not sample:
+        return ContentType.PROSE
+
+    symbols = sum(map(sample.count, _CODE_CHARS))
+    indented = sample.count("\n    ") + sample.count("\n\t")
+    if symbols / len(sample) > 0.03 or indented > sample.count("\n") // 3:
+        return ContentType.CODE
+
+    return ContentType.PROSE
+
+
+class TokenEstimator:
+    """
+    Fast token estimates from per-model, per-content-type chars-per-token
+    ratios that are recalibrated against provider-reported usage.
+    """
+
+    def __init__(self, smoothing: float = 0.3) -> None:
+        self._smoothing = smoothing
+        self._ratios: dict[str, dict[ContentType, float]] = {}
+        self._lock = threading.Lock()
+
+    def chars_per_token(self, model: str, content_type: ContentType) -> float:
+        ratios = self._ratios.get(model)
+        if ratios is None:
+            return DEFAULT_CHARS_PER_TOKEN[content_type]
+        return ratios[content_type]
+
+    def estimate(
+        self,
+        text: str,
+        model: str = "gpt-4",
+        content_type: ContentType | None = None,
+    ) -> int:
+        if not text:
+            return 0
+        content_type = content_type or detect_content_type(text)
+        return max(1, round(len(text) / self.chars_per_token(model, content_type)))
+
+    def observe(self, model: str, texts: Sequence[str], actual_tokens: int) -> None:
+        """
+        Reconcile estimates for `texts` against the token count the provider
+        actually billed for them, e.g. TokenUsage.prompt_tokens.
+        """
+        chars: dict[ContentType, int] = {}
+        for text in texts:
+            if text:
+                content_type = detect_content_type(text)
+                chars[content_type] = chars.get(content_type, 0) + len(text)
+
+        if not chars or actual_tokens <= 0:
+            return
+
+        with self._lock:
+            ratios = self._ratios.setdefault(model, dict(DEFAULT_CHARS_PER_TOKEN))
+            estimated = {kind: count / ratios[kind] for kind, count in chars.items()}
+            total_estimated = sum(estimated.values())
+            correction = actual_tokens / total_estimated
+
+            # Each type moves in proportion to its share of the estimate
+            for kind, tokens in estimated.items():
+                weight = self._smoothing * tokens / total_estimated
+                target = ratios[kind] / correction
+                ratio = (1 - weight) * ratios[kind] + weight * target
+                ratios[kind] = min(8.0, max(1.0, ratio))
+
+
+_estimator = TokenEstimator()
+
+
+def get_estimator() -> TokenEstimator:
+    return _estimator
+
+
+def estimate_tokens(
+    text: str,
+    model: str = "gpt-4",
+    content_type: ContentType | None = None,
+) -> int:
+    return max(1, _estimator.estimate(text, model, content_type))
+
+
+class TruncationPolicy(str, Enum):
+    HEAD = "head"
+    TAIL = "tail"
+    HEAD_TAIL = "head_tail"
+
+
+@dataclass
+class EncodedText:
+    """
+    Text encoded once. Truncation cuts at token indices and decodes the kept
+    tokens directly, so no prefix of the text is ever re-tokenized.
+    """
+    text: str
+    tokens: list[int]
+    encoding: tiktoken.Encoding
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def truncate(
+        self,
+        max_tokens: int,
+        suffix: str = "\n... [truncated]",
+        preserve_lines: bool = True,
+        policy: TruncationPolicy = TruncationPolicy.HEAD,
+    ) -> str:
+        if len(self.tokens) <= max_tokens:
+            return self.text
+
+        target_tokens = max_tokens - len(self.encoding.encode_ordinary(suffix))
+
+        # Token boundaries can merge across the cut ("\n    "), so check the
+        # assembled result once and tighten if it overshoots.
+        for _ in range(3):
+            if target_tokens <= 0:
+                return suffix.strip()
+            result = self._assemble(target_tokens, suffix, preserve_lines, policy)
+            overflow = len(self.encoding.encode_ordinary(result)) - max_tokens
+            if overflow <= 0:
+                return result
+            target_tokens -= overflow
+
+        # Still over budget: max_tokens is a hard cap, so give up on whole
+        # lines and cut at token boundaries until the result fits
+        while target_tokens > 0:
+            result = self._assemble(target_tokens, suffix, False, policy)
+            overflow = len(self.encoding.encode_ordinary(result)) - max_tokens
+            if overflow <= 0:
+                return result
+            target_tokens -= overflow
+        return suffix.strip()
+
+    def line_token_offsets(self) -> array:
+        """Prefix sums: number of tokens that end before each line starts."""
+        lengths = _token_byte_lengths(self.encoding.name)
+        ends = array("Q", accumulate(map(lengths.__getitem__, self.tokens)))
+        data = self.text.encode("utf-8", errors="surrogatepass")
+
+        offsets = array("I", [0])
+        index = 0
+        pos = data.find(b"\n")
+        while pos != -1:
+            index = bisect_right(ends, pos + 1, index)
+            offsets.append(index)
+            pos = data.find(b"\n", pos + 1)
+        return offsets
+
+    def _assemble(
+        self,
+        target_tokens: int,
+        suffix: str,
+        preserve_lines: bool,
+        policy: TruncationPolicy,
+    ) -> str:
+        if policy == TruncationPolicy.TAIL:
+            return suffix.lstrip("\n") + "\n" + self._tail(target_tokens, preserve_lines)
+
+        if policy == TruncationPolicy.HEAD_TAIL:
+            head_tokens = target_tokens // 2
+            return (
+                self._head(head_tokens, preserve_lines)
+                + suffix
+                + "\n"
+                + self._tail(target_tokens - head_tokens, preserve_lines)
+            )
+
+        return self._head(target_tokens, preserve_lines) + suffix
+
+    def _head(self, token_count: int, preserve_lines: bool) -> str:
+        data = self.encoding.decode_bytes(self.tokens[:token_count])
+        if preserve_lines:
+            cut = data.rfind(b"\n")
+            if cut > 0:
+                data = data[:cut]
+        return data.decode("utf-8", errors="ignore")
+
+    def _tail(self, token_count: int, preserve_lines: bool) -> str:
+        data = self.encoding.decode_bytes(self.tokens[-token_count:])
+        if preserve_lines:
+            previous = self.encoding.decode_single_token_bytes(self.tokens[-token_count - 1])
+            if not previous.endswith(b"\n"):
+                cut = data.find(b"\n")
+                if cut != -1 and cut + 1 < len(data):
+                    data = data[cut + 1:]
+        return data.decode("utf-8", errors="ignore")
+
+
+def encode_text(text: str, model: str = "gpt-4") -> EncodedText | None:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return None
+    return EncodedText(text, encoding.encode_ordinary(text), encoding)
 
 
 def truncate_text(
     text: str,
-    model: str,
     max_tokens: int,
+    model: str = "gpt-4",
     suffix: str = "\n... [truncated]",
     preserve_lines: bool = True,
-):
-    current_tokens = count_tokens(text, model)
-    if current_tokens <= max_tokens:
+    policy: TruncationPolicy = TruncationPolicy.HEAD,
+) -> str:
+    if utf8_length(text) <= max_tokens:
+        # Cannot be over budget; see count_tokens
         return text
 
-    suffix_tokens = count_tokens(suffix, model)
-    target_tokens = max_tokens - suffix_tokens
+    encoding = get_encoding(model)
+    if encoding is None:
+        return _truncate_estimated(text, max_tokens, model, suffix, preserve_lines, policy)
+
+    cache = get_token_cache() if len(text) >= MIN_CACHED_CHARS else None
+    if cache is not None:
+        entry = cache.get(text, encoding.name)
+        if entry is not None:
+            if entry.tokens <= max_tokens:
+                return text
+            if preserve_lines and entry.line_offsets is not None:
+                result = _truncate_by_line_offsets(text, entry, encoding, max_tokens, suffix, policy)
+                if result is not None:
+                    return result
+
+    encoded = EncodedText(text, encoding.encode_ordinary(text), encoding)
+    result = encoded.truncate(max_tokens, suffix, preserve_lines, policy)
+
+    if cache is not None:
+        truncated = len(encoded) > max_tokens
+        cache.put(
+            text,
+            encoding.name,
+            len(encoded),
+            encoded.line_token_offsets() if truncated else None,
+        )
+    return result
+
+
+def _truncate_by_line_offsets(
+    text: str,
+    entry: TokenCacheEntry,
+    encoding: tiktoken.Encoding,
+    max_tokens: int,
+    suffix: str,
+    policy: TruncationPolicy,
+) -> str | None:
+    # Cut on cached line prefix sums without encoding the input at all.
+    # Returns None when no whole line fits or the result overshoots.
+    offsets = entry.line_offsets
+    target_tokens = max_tokens - len(encoding.encode_ordinary(suffix))
+
+    def head(token_count: int) -> str | None:
+        line = bisect_right(offsets, token_count) - 1
+        if line <= 0:
+            return None
+        pos = -1
+        for _ in range(line):
+            pos = text.find("\n", pos + 1)
+        return text[:pos]
+
+    def tail(token_count: int) -> str | None:
+        line = bisect_left(offsets, entry.tokens - token_count)
+        if line >= len(offsets):
+            return None
+        pos = len(text)
+        for _ in range(len(offsets) - line):
+            pos = text.rfind("\n", 0, pos)
+        return text[pos + 1:]
 
     if target_tokens <= 0:
-        return suffix.strip()
+        return None
 
-    if preserve_lines:
-        return _truncate_by_lines(text, target_tokens, suffix, model)
+    if policy == TruncationPolicy.TAIL:
+        kept = tail(target_tokens)
+        result = None if kept is None else suffix.lstrip("\n") + "\n" + kept
+    elif policy == TruncationPolicy.HEAD_TAIL:
+        first, last = head(target_tokens // 2), tail(target_tokens - target_tokens // 2)
+        result = None if first is None or last is None else first + suffix + "\n" + last
     else:
-        return _truncate_by_chars(text, target_tokens, suffix, model)
+        kept = head(target_tokens)
+        result = None if kept is None else kept + suffix
+
+    if result is None or len(encoding.encode_ordinary(result)) > max_tokens:
+        return None
+    return result
+
+
+def _truncate_estimated(
+    text: str,
+    max_tokens: int,
+    model: str,
+    suffix: str,
+    preserve_lines: bool,
+    policy: TruncationPolicy,
+) -> str:
+    # No tokenizer available: apply the same policies on estimate_tokens' scale
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+
+    chars_per_token = _estimator.chars_per_token(model, detect_content_type(text))
+    target_chars = int((max_tokens - estimate_tokens(suffix, model)) * chars_per_token)
+    if target_chars <= 0:
+        return suffix.strip()
 
+    def head(chars: int) -> str:
+        kept = text[:chars]
+        cut = kept.rfind("\n") if preserve_lines else -1
+        return kept[:cut] if cut > 0 else kept
 
-def _truncate_by_lines(text: str, target_tokens: int, suffix: str, model: str) -> str:
-    lines = text.split("\n")
-    result_lines: list[str] = []
-    current_tokens = 0
+    def tail(chars: int) -> str:
+        kept = text[-chars:]
+        if preserve_lines and text[-chars - 1] != "\n":
+            cut = kept.find("\n")
+            if cut != -1 and cut + 1 < len(kept):
+                kept = kept[cut + 1:]
+        return kept
 
-    for line in lines:
-        line_tokens = count_tokens(line + "\n", model)
-        if current_tokens + line_tokens > target_tokens:
-            break
-        result_lines.append(line)
-        current_tokens += line_tokens
+    if policy == TruncationPolicy.TAIL:
+        return suffix.lstrip("\n") + "\n" + tail(target_chars)
+    if policy == TruncationPolicy.HEAD_TAIL:
+        return head(target_chars // 2) + suffix + "\n" + tail(target_chars - target_chars // 2)
+    return head(target_chars) + suffix
 
-    if not result_lines:
-        # Fall back to character truncation if no complete lines fit
-        return _truncate_by_chars(text, target_tokens, suffix, model)
 
-    return "\n".join(result_lines) + suffix
+def _hunk_range(start: int, length: int) -> str:
+    # Unified diff convention (as git and difflib print it): an empty range
+    # names the line before it, and a length of 1 is omitted
+    if length == 1:
+        return f"{start}"
+    if length == 0:
+        start -= 1
+    return f"{start},{length}"
 
 
-def _truncate_by_chars(text: str, target_tokens: int, suffix: str, model: str) -> str:
-    # Binary search for the right length
-    low, high = 0, len(text)
+def diff_lines(
+    old_lines: Sequence[str],
+    new_lines: Sequence[str],
+    first_line: int = 1,
+    context_lines: int = 3,
+    max_tokens: int | None = None,
+    model: str = "gpt-4",
+) -> str | None:
+    """
+    Unified diff of two line windows that both start at file line
+    `first_line`, with hunk headers in file line numbers.
 
-    while low < high:
-        mid = (low + high + 1) // 2
-        if count_tokens(text[:mid], model) <= target_tokens:
-            low = mid
-        else:
-            high = mid - 1
+    Returns "" when nothing changed and None when the diff would take more
+    than `max_tokens` tokens.
+    """
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    hunks = []
+    for group in matcher.get_grouped_opcodes(context_lines):
+        old_start, old_end = group[0][1], group[-1][2]
+        new_start, new_end = group[0][3], group[-1][4]
+        hunk = [
+            f"@@ -{_hunk_range(first_line + old_start, old_end - old_start)} "
+            f"+{_hunk_range(first_line + new_start, new_end - new_start)} @@"
+        ]
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                hunk.extend(f" {line}" for line in old_lines[i1:i2])
+                continue
+            hunk.extend(f"-{line}" for line in old_lines[i1:i2])
+            hunk.extend(f"+{line}" for line in new_lines[j1:j2])
+        hunks.append("\n".join(hunk))
 
-    return text[:low] + suffix
\ No newline at end of file
+    diff = "\n".join(hunks)
+    if max_tokens is not None and count_tokens(diff, model, budget=max_tokens) > max_tokens:
+        return None
+    return diff
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.paths import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Hashing and a sqlite lookup cost far less than tokenizing text this large
+MIN_CACHED_CHARS = 16 * 1024
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Size is re-checked every N writes rather than on each one
+EVICTION_CHECK_INTERVAL = 32
+
+
+@dataclass
+class TokenCacheEntry:
+    tokens: int
+    # Token index at the start of each line, when the text has been truncated before
+    line_offsets: array | None = None
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.blake2b(
+        text.encode("utf-8", errors="surrogatepass"),
+        digest_size=16,
+    ).digest()
+
+
+class TokenCache:
+    """
+    On-disk map of (content hash, encoding) -> token count and line-boundary
+    token prefix sums, shared by every process on the machine.
+
+    Backed by sqlite in WAL mode, so concurrent readers and writers in other
+    processes are safe. Entries are evicted least-recently-used once the
+    stored size passes `max_bytes`.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS token_counts (
+                    key BLOB NOT NULL,
+                    encoding TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    line_offsets BLOB,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (key, encoding)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS token_counts_accessed ON token_counts (accessed)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, text: str, encoding: str) -> TokenCacheEntry | None:
+        key = content_key(text)
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT tokens, line_offsets FROM token_counts WHERE key = ? AND encoding = ?",
+                (key, encoding),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE token_counts SET accessed = ? WHERE key = ? AND encoding = ?",
+                (time.time(), key, encoding),
+            )
+        except sqlite3.Error as e:
+            logger.debug(f"token cache read failed: {e}")
+            return None
+
+        tokens, blob = row
+        line_offsets = None
+        if blob is not None:
+            line_offsets = array("I")
+            line_offsets.frombytes(blob)
+        return TokenCacheEntry(tokens=tokens, line_offsets=line_offsets)
+
+    def put(
+        self,
+        text: str,
+        encoding: str,
+        tokens: int,
+        line_offsets: array | None = None,
+    ) -> None:
+        blob = line_offsets.tobytes() if line_offsets is not None else None
+        # Row overhead is small next to the blob; 64 bytes is close enough
+        size = 64 + (len(blob) if blob else 0)
+        try:
+            conn = self._connect()
+            if blob is None:
+                # Never drop prefix sums stored by an earlier truncation
+                conn.execute(
+                    """
+                    INSERT INTO token_counts (key, encoding, tokens, line_offsets, size, accessed)
+                    VALUES (?, ?, ?, NULL, ?, ?)
+                    ON CONFLICT (key, encoding) DO UPDATE SET accessed = excluded.accessed
+                    """,
+                    (content_key(text), encoding, tokens, size, time.time()),
+                )
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO token_counts VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_key(text), encoding, tokens, blob, size, time.time()),
+                )
+        except sqlite3.Error as e:
+            logger.debug(f"token cache write failed: {e}")
+            return
+
+        self._writes += 1
+        if self._writes % EVICTION_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        try:
+            conn = self._connect()
+            (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM token_counts").fetchone()
+            if total <= self.max_bytes:
+                return
+            # Trim to 90% so we do not evict again on the next write
+            excess = total - int(self.max_bytes * 0.9)
+            conn.execute(
+                """
+                DELETE FROM token_counts WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, size, SUM(size) OVER (ORDER BY accessed, rowid) AS running
+                        FROM token_counts
+                    ) WHERE running - size < ?
+                )
+                """,
+                (excess,),
+            )
+        except sqlite3.Error as e:
+            logger.debug(f"token cache eviction failed: {e}")
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM token_counts")
+
+
+_token_cache: TokenCache | None = None
+_token_cache_disabled = False
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache | None:
+    global _token_cache, _token_cache_disabled
+    if _token_cache is not None or _token_cache_disabled:
+        return _token_cache
+
+    with _token_cache_lock:
+        if _token_cache is None and not _token_cache_disabled:
+            if os.getenv("ANCIENT_TOKEN_CACHE", "1") == "0":
+                _token_cache_disabled = True
+                return None
+            try:
+                _token_cache = TokenCache(get_cache_dir() / "tokens.sqlite3")
+            except (OSError, sqlite3.Error) as e:
+                # Read-only home, locked-down sandbox, ... just run uncached
+                logger.warning(f"Token cache disabled: {e}")
+                _token_cache_disabled = True
+    return _token_cache